@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,10 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def inline_thumbnails(settings):
+    # Миниатюры создаются сразу, а не в фоновом потоке, который может
+    # писать во временный MEDIA_ROOT, пока фикстура его удаляет
+    settings.THUMBNAIL_WORKERS = 0
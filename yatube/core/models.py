@@ -10,3 +10,27 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class CounterFieldsMixin:
+    """
+    Не даёт save() затереть счётчики устаревшими значениями.
+
+    Счётчики из counter_fields меняются только запросами с F(),
+    поэтому при сохранении уже существующей записи они не пишутся.
+    """
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            self.counter_fields
+            and not self._state.adding
+            and kwargs.get('update_fields') is None
+            and not args
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
@@ -0,0 +1,118 @@
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+)
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+RANGE_RE = re.compile(r'^bytes=(?P<start>\d*)-(?P<end>\d*)$')
+
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """
+    Один диапазон из заголовка Range: (начало, конец включительно).
+    None - диапазона нет или он не разобран, тогда отдаётся весь файл.
+    ValueError - диапазон за пределами файла.
+    """
+    match = RANGE_RE.match(header or '')
+    if match is None or not size:
+        return None
+    start, end = match['start'], match['end']
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500: последние 500 байт
+        start, end = max(size - int(end), 0), size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def read_range(file, start, length):
+    file.seek(start)
+    try:
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def guess_type(path):
+    content_type, encoding = mimetypes.guess_type(path)
+    return content_type or 'application/octet-stream', encoding
+
+
+def sendfile_response(path, internal_url):
+    """Ответ без тела: файл отдаст фронтовой сервер по заголовку."""
+    response = HttpResponse(content_type=guess_type(path)[0])
+    if settings.SENDFILE_BACKEND == 'nginx':
+        response['X-Accel-Redirect'] = quote(internal_url)
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def send_file(request, path, internal_url=None, cache_control=None):
+    """
+    Отдаёт файл с диска. При SENDFILE_BACKEND 'nginx' или 'apache' байты
+    отдаёт фронтовой сервер (X-Accel-Redirect на internal_url или
+    X-Sendfile), иначе - FileResponse, который сервер отправит через
+    wsgi.file_wrapper, с поддержкой If-Modified-Since и Range.
+    Права на файл проверяет вызывающая сторона.
+    """
+    if settings.SENDFILE_BACKEND == 'apache' or (
+        settings.SENDFILE_BACKEND == 'nginx' and internal_url
+    ):
+        response = sendfile_response(path, internal_url)
+    else:
+        response = file_response(request, path)
+    if cache_control:
+        response['Cache-Control'] = cache_control
+    return response
+
+
+def file_response(request, path):
+    stat = os.stat(path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime, stat.st_size
+    ):
+        return HttpResponseNotModified()
+    content_type, encoding = guess_type(path)
+    try:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), stat.st_size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+        return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+        response['Content-Length'] = stat.st_size
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = StreamingHttpResponse(
+            read_range(open(path, 'rb'), start, length),
+            status=206, content_type=content_type
+        )
+        response['Content-Length'] = length
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Accept-Ranges'] = 'bytes'
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return response
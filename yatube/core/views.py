@@ -1,4 +1,13 @@
+import os
+import posixpath
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import Http404
 from django.shortcuts import render
+from django.utils._os import safe_join
+
+from .sendfile import send_file
 
 
 def page_not_found(request, exception):
@@ -15,3 +24,32 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=403)
+
+
+def serve_media(request, path):
+    """
+    Файлы из MEDIA_ROOT. Каталоги из MEDIA_PUBLIC_DIRS открыты всем,
+    остальное - только персоналу. Байты отдаёт send_file.
+    """
+    # Открыт ли каталог, решаем по нормализованному пути:
+    # иначе posts/../secret.txt прошёл бы как публичный
+    path = posixpath.normpath(path).lstrip('/')
+    if path.split('/')[0] in ('..', '.'):
+        raise Http404
+    public = path.startswith(settings.MEDIA_PUBLIC_DIRS)
+    if not public and not request.user.is_staff:
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    return send_file(
+        request, full_path,
+        internal_url=settings.MEDIA_INTERNAL_URL + path,
+        cache_control=(
+            f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}' if public
+            else 'private, no-cache'
+        )
+    )
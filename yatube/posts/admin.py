@@ -1,6 +1,97 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.cache import cache
 
 from .models import Post, Group, Follow
+from .search import filter_matching, match_expression
+from .utils import CachedCountPaginator, CursorPaginator, feed_count_key
+from .versions import version_key, version_tag
+
+CURSOR_VAR = 'cursor'
+
+
+def group_choices():
+    """
+    Варианты групп для выпадающих списков админки. Кэшируются до
+    изменения любой группы, чтобы не читать их на каждой странице.
+    """
+    key = f'admin_group_choices:{version_tag(version_key("groups"))}'
+    choices = cache.get(key)
+    if choices is None:
+        choices = [('', '---------')] + list(
+            Group.objects.order_by('title').values_list('pk', 'title')
+        )
+        cache.set(key, choices, None)
+    return choices
+
+
+class EstimatedCountPaginator(CachedCountPaginator):
+    exact_without_key = False
+
+    def __init__(self, object_list, per_page, orphans=0,
+                 allow_empty_first_page=True):
+        # Аргументы по порядку, как их передаёт ModelAdmin.get_paginator
+        super().__init__(
+            object_list, per_page, orphans=orphans,
+            allow_empty_first_page=allow_empty_first_page
+        )
+
+
+class AdminCursorPaginator(CursorPaginator):
+    exact_without_key = False
+
+
+class PostChangeList(ChangeList):
+    """
+    Список постов с курсорной пагинацией по (created, id), пока он
+    отсортирован по умолчанию. При сортировке по колонке остаются номера
+    страниц, но число записей всё равно считается не дальше
+    FEED_COUNT_LIMIT.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_results(self, request):
+        self.cursor_page = None
+        if ORDER_VAR in self.params:
+            return super().get_results(request)
+        # Без фильтров и поиска число постов уже лежит в кэше главной
+        unfiltered = (
+            self.queryset.query.where == self.root_queryset.query.where
+        )
+        # Страница ищется по индексу (created, id) одними ключами,
+        # а строки с авторами и группами читаются вторым запросом по pk.
+        # result_list должен остаться QuerySet: на нём строится формсет
+        paginator = AdminCursorPaginator(
+            self.queryset.select_related(None).only('id', 'created'),
+            self.list_per_page,
+            count_key=feed_count_key('index') if unfiltered else None
+        )
+        page = paginator.get_page(self.params.get(CURSOR_VAR))
+        self.result_count = paginator.count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = self.queryset.filter(
+            pk__in=[post.pk for post in page]
+        ).order_by('-created', '-id')
+        self.can_show_all = False
+        self.multi_page = False
+        self.paginator = paginator
+        self.cursor_page = page
+        self.first_url = self.previous_url = self.next_url = None
+        if page.previous_cursor:
+            self.first_url = self.get_query_string(remove=[CURSOR_VAR])
+            self.previous_url = self.get_query_string(
+                {CURSOR_VAR: page.previous_cursor}
+            )
+        if page.next_cursor:
+            self.next_url = self.get_query_string(
+                {CURSOR_VAR: page.next_cursor}
+            )
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -12,10 +103,31 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('created',)
+    date_hierarchy = 'created'
+    raw_id_fields = ('author',)
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
     empty_value_display = '-пусто-'
 
+    def get_changelist(self, request, **kwargs):
+        return PostChangeList
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        field = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if db_field.name == 'group':
+            # Список один на все строки страницы и берётся из кэша
+            field.choices = group_choices()
+        return field
+
+    def get_search_results(self, request, queryset, search_term):
+        """Ищет по полнотекстовому индексу вместо LIKE по всей таблице."""
+        if not match_expression(search_term):
+            return queryset, False
+        return filter_matching(queryset, search_term), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
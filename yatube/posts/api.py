@@ -0,0 +1,420 @@
+import re
+from functools import reduce, wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.fields.files import FieldFile
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import require_safe
+
+from .decorators import cache_anonymous, conditional_get
+from .models import Comment, Group, Post, User
+from .timeline import pulled_queryset, timeline_queryset
+from .utils import MAX_PK, TimelinePaginator, get_page_obj
+from .versions import (
+    cached_value, get_versions, group_versions, groups_versions,
+    index_versions, lookup_key, post_versions, profile_versions, version_key
+)
+
+# Ключи курсора: они читаются всегда, какие бы поля ни запросили
+CURSOR_FIELDS = ('id', 'created')
+# Параметры запроса, от которых зависит ответ: из них строится ключ кэша
+PARAMS = ('cursor', 'limit', 'fields', 'include')
+# Целое из параметра: только ASCII-цифры (isdigit() пропускает «²»,
+# на котором падает int()) и не длиннее 2 ** 63
+DIGITS = re.compile('[0-9]{1,19}')
+
+
+class ApiError(Exception):
+    """Неверные параметры запроса: ответ 400 с текстом ошибки."""
+
+
+class Resource:
+    """
+    Как объект модели выглядит в API.
+
+    fields: имя в ответе -> путь к значению через «__», он же аргумент
+    only(). includes: имя для include= -> (поле с id, ресурс связанного
+    объекта). Связанные объекты выводятся в included[name].
+    """
+
+    def __init__(self, name, queryset, fields, includes=None):
+        self.name = name
+        self.queryset = queryset
+        self.fields = fields
+        self.includes = includes or {}
+
+    def only(self, fields, includes, keys=()):
+        """Поля для only(): запрошенные, ключи курсора и id для include."""
+        return list({
+            *keys,
+            *(self.fields[name] for name in fields),
+            *(self.includes[name][0] for name in includes),
+        })
+
+    def values(self, obj, fields):
+        result = {}
+        for name in fields:
+            value = reduce(getattr, self.fields[name].split('__'), obj)
+            if isinstance(value, FieldFile):
+                value = value.url if value else None
+            result[name] = value
+        return result
+
+
+USERS = Resource('users', User.objects, {
+    'id': 'id',
+    'username': 'username',
+    'first_name': 'first_name',
+    'last_name': 'last_name',
+})
+PROFILES = Resource('profiles', User.objects.select_related('stats'), {
+    **USERS.fields,
+    'posts_count': 'stats__posts_count',
+    'followers_count': 'stats__followers_count',
+    'following_count': 'stats__following_count',
+})
+GROUPS = Resource('groups', Group.objects, {
+    'id': 'id',
+    'slug': 'slug',
+    'title': 'title',
+    'description': 'description',
+    'posts_count': 'posts_count',
+})
+POSTS = Resource('posts', Post.objects, {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author_id',
+    'group': 'group_id',
+    'image': 'image',
+    'comments_count': 'comments_count',
+}, {
+    'author': ('author_id', USERS),
+    'group': ('group_id', GROUPS),
+})
+COMMENTS = Resource('comments', Comment.objects, {
+    'id': 'id',
+    'post': 'post_id',
+    'author': 'author_id',
+    'text': 'text',
+    'created': 'created',
+}, {
+    'author': ('author_id', USERS),
+    'post': ('post_id', POSTS),
+})
+
+
+def requested(request, param, allowed, default):
+    """Список из параметра вида a,b,c; неизвестные имена - ApiError."""
+    value = request.GET.get(param)
+    if value is None:
+        return default
+    names = [name for name in value.split(',') if name]
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ApiError(
+            f'Неизвестные значения {param}: {", ".join(unknown)}'
+        )
+    return names
+
+
+def page_size(request):
+    value = request.GET.get('limit')
+    if value is None:
+        return settings.API_PAGE_SIZE
+    limit = settings.API_MAX_PAGE_SIZE
+    if not DIGITS.fullmatch(value) or not 0 < int(value) <= limit:
+        raise ApiError(
+            f'limit должен быть от 1 до {limit}'
+        )
+    return int(value)
+
+
+def included(resource, objects, includes):
+    """
+    Связанные объекты страницы: по одному запросу in_bulk на каждое
+    имя из include=, только с полями, которые выводятся.
+    """
+    result = {}
+    for name in includes:
+        attname, related = resource.includes[name]
+        ids = {getattr(obj, attname) for obj in objects} - {None}
+        found = related.queryset.only(
+            *related.only(related.fields, ())
+        ).in_bulk(ids) if ids else {}
+        result[related.name] = [
+            related.values(obj, related.fields) for obj in found.values()
+        ]
+    return result
+
+
+def json_response(data, status=200):
+    # Кириллица без \u-последовательностей: ответ вдвое короче
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def api_view(view):
+    """Только GET и HEAD, ошибки - в JSON, а не страницей сайта."""
+    @require_safe
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        try:
+            return view(request, *args, **kwargs)
+        except ApiError as error:
+            return json_response({'error': str(error)}, status=400)
+        except Http404:
+            return json_response({'error': 'Не найдено'}, status=404)
+    return wrapper
+
+
+def selection(request, resource, keys):
+    """Запрошенные fields= и include= и поля для only()."""
+    fields = requested(
+        request, 'fields', resource.fields, list(resource.fields)
+    )
+    includes = requested(request, 'include', resource.includes, [])
+    return fields, includes, resource.only(fields, includes, keys)
+
+
+def render_page(request, resource, fields, includes, queryset, **kwargs):
+    page = get_page_obj(
+        queryset, request, per_page=page_size(request), **kwargs
+    )
+    return json_response({
+        'results': [resource.values(obj, fields) for obj in page],
+        'included': included(resource, page, includes),
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+
+
+def page_response(request, resource, queryset):
+    """Страница объектов по курсору (created, id) с нужными полями."""
+    fields, includes, only = selection(request, resource, CURSOR_FIELDS)
+    return render_page(
+        request, resource, fields, includes,
+        queryset.select_related(None).only(*only)
+    )
+
+
+def object_response(request, resource, queryset, **lookup):
+    fields, includes, only = selection(request, resource, ('id',))
+    obj = get_object_or_404(queryset.only(*only), **lookup)
+    return json_response({
+        'result': resource.values(obj, fields),
+        'included': included(resource, [obj], includes),
+    })
+
+
+@conditional_get(index_versions)
+@cache_anonymous(index_versions, PARAMS)
+@api_view
+def posts(request):
+    return page_response(request, POSTS, Post.objects.all())
+
+
+@conditional_get(post_versions)
+@cache_anonymous(post_versions, PARAMS)
+@api_view
+def post(request, post_id):
+    return object_response(request, POSTS, Post.objects, pk=post_id)
+
+
+@conditional_get(post_versions)
+@cache_anonymous(post_versions, PARAMS)
+@api_view
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('id'), pk=post_id)
+    return page_response(
+        request, COMMENTS, Comment.objects.filter(post_id=post_id)
+    )
+
+
+def batch_ids(request):
+    """id из ids=1,2,3 без повторов, не больше API_BATCH_MAX_IDS."""
+    values = [value for value in request.GET.get('ids', '').split(',')
+              if value]
+    if not values or not all(
+        DIGITS.fullmatch(value) and 0 < int(value) < MAX_PK
+        for value in values
+    ):
+        raise ApiError('ids - это список id постов через запятую')
+    ids = list(dict.fromkeys(int(value) for value in values))
+    if len(ids) > settings.API_BATCH_MAX_IDS:
+        raise ApiError(
+            f'Не больше {settings.API_BATCH_MAX_IDS} id за запрос'
+        )
+    return ids
+
+
+def post_entry(post):
+    """Пост для кэша пакетной выдачи: все поля, автор и группа."""
+    return {
+        'post': POSTS.values(post, POSTS.fields),
+        'author': USERS.values(post.author, USERS.fields),
+        'group': (
+            GROUPS.values(post.group, GROUPS.fields) if post.group else None
+        ),
+    }
+
+
+def cached_posts(ids):
+    """
+    Записи post_entry по id. Каждая кэшируется под версиями поста,
+    пользователей и групп, а из базы одним in_bulk читаются только
+    промахи. Несуществующий id кэшируется как False. Версия для него не
+    создаётся, иначе любой клиент заполнит кэш вечными ключами: запись
+    держится на версии главной ленты, которую поднимает появление
+    и удаление любого поста.
+    """
+    users, groups, index = get_versions(
+        version_key('users'), version_key('groups'), version_key('index')
+    )
+    versions = cache.get_many([version_key('post', pk) for pk in ids])
+
+    def entry_key(pk, version):
+        return f'api_post:{pk}:{version}.{users}.{groups}'
+
+    keys = {
+        pk: entry_key(pk, versions.get(version_key('post', pk), f'i{index}'))
+        for pk in ids
+    }
+    cached = cache.get_many(keys.values())
+    entries = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    missing = [pk for pk in ids if pk not in entries]
+    if missing:
+        posts = Post.objects.select_related('author', 'group').only(
+            *POSTS.fields.values(),
+            *(f'author__{name}' for name in USERS.fields.values()),
+            *(f'group__{name}' for name in GROUPS.fields.values()),
+        ).in_bulk(missing)
+        # Версии создаются только для существующих постов
+        cold = [
+            pk for pk in posts if version_key('post', pk) not in versions
+        ]
+        if cold:
+            cold_versions = get_versions(
+                *(version_key('post', pk) for pk in cold)
+            )
+            for pk, version in zip(cold, cold_versions):
+                keys[pk] = entry_key(pk, version)
+        fresh = {pk: False for pk in missing}
+        fresh.update(
+            (pk, post_entry(post)) for pk, post in posts.items()
+        )
+        cache.set_many(
+            {keys[pk]: entry for pk, entry in fresh.items()},
+            settings.RESPONSE_CACHE_TIMEOUT
+        )
+        entries.update(fresh)
+    return entries
+
+
+@api_view
+def posts_batch(request):
+    """
+    Много постов по id одним ответом: ?ids=1,2,3. Посты идут в порядке
+    ids, не найденные перечислены в missing.
+    """
+    ids = batch_ids(request)
+    fields, includes, _ = selection(request, POSTS, ())
+    entries = cached_posts(ids)
+    results, missing, related = [], [], {}
+    for pk in ids:
+        entry = entries[pk]
+        if not entry:
+            missing.append(pk)
+            continue
+        results.append({name: entry['post'][name] for name in fields})
+        for name in includes:
+            if entry[name]:
+                collection = related.setdefault(
+                    POSTS.includes[name][1].name, {}
+                )
+                collection[entry[name]['id']] = entry[name]
+    return json_response({
+        'results': results,
+        'included': {
+            name: list(objects.values())
+            for name, objects in related.items()
+        },
+        'missing': missing,
+    })
+
+
+@cache_anonymous(groups_versions, PARAMS)
+@api_view
+def groups(request):
+    fields, _, only = selection(request, GROUPS, ('id',))
+    return json_response({
+        'results': [
+            GROUPS.values(group, fields)
+            for group in Group.objects.only(*only).order_by('title')
+        ],
+    })
+
+
+@conditional_get(group_versions)
+@cache_anonymous(group_versions, PARAMS)
+@api_view
+def group(request, slug):
+    return object_response(request, GROUPS, Group.objects, slug=slug)
+
+
+@conditional_get(group_versions)
+@cache_anonymous(group_versions, PARAMS)
+@api_view
+def group_posts(request, slug):
+    pk = cached_value(
+        lookup_key('group_pk', slug),
+        Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    )
+    if pk is None:
+        raise Http404
+    return page_response(request, POSTS, Post.objects.filter(group_id=pk))
+
+
+@conditional_get(profile_versions)
+@cache_anonymous(profile_versions, PARAMS)
+@api_view
+def profile(request, username):
+    return object_response(
+        request, PROFILES, PROFILES.queryset, username=username
+    )
+
+
+@conditional_get(profile_versions)
+@cache_anonymous(profile_versions, PARAMS)
+@api_view
+def profile_posts(request, username):
+    pk = cached_value(
+        lookup_key('author_pk', username),
+        User.objects.filter(username=username).values_list('pk', flat=True)
+    )
+    if pk is None:
+        raise Http404
+    return page_response(request, POSTS, Post.objects.filter(author_id=pk))
+
+
+@api_view
+def follow(request):
+    """Лента подписок вошедшего пользователя."""
+    if not request.user.is_authenticated:
+        return json_response({'error': 'Нужно войти'}, status=401)
+    fields, includes, only = selection(request, POSTS, CURSOR_FIELDS)
+    timeline = timeline_queryset(request.user).select_related(
+        None
+    ).select_related('post').only(
+        'created', 'post', *(f'post__{name}' for name in only)
+    )
+    pulled = pulled_queryset(request.user)
+    if pulled is not None:
+        pulled = pulled.select_related(None).only(*only)
+    return render_page(
+        request, POSTS, fields, includes, timeline,
+        paginator_class=TimelinePaginator, pulled=pulled
+    )
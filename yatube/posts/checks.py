@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Кэши, которые живут внутри одного процесса
+PROCESS_LOCAL_CACHES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Версии кэша поднимаются в том процессе, где изменились данные.
+    Чтобы их видели остальные воркеры, кэш должен быть общим.
+    """
+    backend = settings.CACHES['default']['BACKEND']
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Error(
+        f'Кэш {backend} не общий для процессов сервера: версии кэша '
+        'и ETag разойдутся между воркерами.',
+        hint='Задайте адрес memcached в MEMCACHED_LOCATION.',
+        id='posts.E001',
+    )]
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, MediaFile, Post, User, UserStats
+
+
+def change(model, pk, field, delta):
+    """
+    Сдвигает счётчик одним UPDATE ... SET field = field + delta.
+    Ниже нуля счётчик не опускается, расхождение исправит reconcile().
+    """
+    rows = model.objects.filter(pk=pk)
+    if delta < 0:
+        rows = rows.filter(**{f'{field}__gte': -delta})
+    rows.update(**{field: F(field) + delta})
+
+
+def count_of(queryset, field):
+    """Подзапрос с количеством строк queryset на каждое значение field."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+# Модель, счётчик и подзапрос, по которому его можно пересчитать
+COUNTERS = (
+    (Group, 'posts_count', lambda: count_of(Post.objects, 'group')),
+    (Post, 'comments_count', lambda: count_of(Comment.objects, 'post')),
+    (UserStats, 'posts_count', lambda: count_of(Post.objects, 'author')),
+    (
+        UserStats, 'followers_count',
+        lambda: count_of(Follow.objects, 'author')
+    ),
+    (
+        UserStats, 'following_count',
+        lambda: count_of(Follow.objects, 'user')
+    ),
+    (MediaFile, 'references', lambda: count_of(Post.objects, 'image')),
+)
+
+
+def reconcile():
+    """
+    Пересчитывает все счётчики и исправляет разошедшиеся.
+    Возвращает словарь «модель.счётчик: сколько строк исправлено».
+    """
+    missing = User.objects.filter(stats__isnull=True).values_list(
+        'pk', flat=True
+    )
+    UserStats.objects.bulk_create(
+        [UserStats(user_id=pk) for pk in missing], ignore_conflicts=True
+    )
+    fixed = {}
+    for model, field, actual in COUNTERS:
+        with transaction.atomic():
+            drifted = model.objects.annotate(actual=actual()).exclude(
+                **{field: F('actual')}
+            ).values_list('pk', 'actual')
+            for pk, value in drifted:
+                model.objects.filter(pk=pk).update(**{field: value})
+            fixed[f'{model.__name__}.{field}'] = len(drifted)
+    return fixed
@@ -0,0 +1,95 @@
+from functools import wraps
+from hashlib import md5
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.views.decorators.http import condition
+
+from .versions import version_tag
+
+
+def cache_anonymous(get_version_keys, params=('cursor', 'format')):
+    """
+    Кэширует страницу целиком для анонимных пользователей.
+
+    get_version_keys(**kwargs) возвращает ключи версий, от которых
+    зависит страница, или None, если кэш надо обойти. Запись в базу
+    поднимает нужную версию, и ключ кэша страницы просто меняется.
+    В ключ идут путь и только те параметры запроса из params, которые
+    читает view: произвольные ?x=... не плодят записи в кэше.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            version_keys = get_version_keys(**kwargs)
+            if version_keys is None:
+                return view(request, *args, **kwargs)
+            query = urlencode([
+                (name, request.GET[name])
+                for name in params if name in request.GET
+            ])
+            path = md5(f'{request.path}?{query}'.encode()).hexdigest()
+            key = f'response:{path}:{version_tag(*version_keys)}'
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+            response = view(request, *args, **kwargs)
+            if (
+                response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+            ):
+                cache.set(
+                    key,
+                    (response.content, response['Content-Type']),
+                    settings.RESPONSE_CACHE_TIMEOUT
+                )
+            return response
+        return wrapper
+    return decorator
+
+
+def client_tag(request):
+    """
+    Пользователь и отпечаток его CSRF-токена. Формы с токеном есть
+    только у вошедших, а после повторного входа токен меняется:
+    страница со старым токеном не должна вернуться по 304.
+    """
+    if not request.user.is_authenticated:
+        return '0'
+    # get_token заводит токен, если его ещё нет: он уйдёт в cookie
+    # ответа, и ETag совпадёт с токеном в отрендеренной форме
+    get_token(request)
+    fingerprint = md5(request.META['CSRF_COOKIE'].encode()).hexdigest()
+    return f'{request.user.pk}-{fingerprint[:12]}'
+
+
+def conditional_get(get_version_keys, per_user=False):
+    """
+    Условный GET по ETag из версий страницы. ETag считается по кэшу,
+    и если страница не менялась, 304 отдаётся до запросов списка
+    и рендера шаблона. Если страница у каждого пользователя своя
+    (per_user), в ETag входят пользователь и его CSRF-токен.
+
+    Last-Modified не выставляется: по дате нового поста не видны правки
+    и удаления, а время изменения версии точно только до секунды.
+    """
+    def etag(request, **kwargs):
+        version_keys = get_version_keys(**kwargs)
+        if version_keys is None:
+            return None
+        tag = version_tag(*version_keys)
+        if per_user:
+            tag = f'{tag}-{client_tag(request)}'
+        return tag
+
+    return condition(etag_func=etag)
@@ -0,0 +1,105 @@
+import csv
+import json
+from itertools import chain
+
+from django.conf import settings
+
+from .importer import COMMENT, FIELDS, POST
+from .models import Comment, Follow, Post
+
+FOLLOW = 'follow'
+
+# Колонки CSV: поля импорта и подписчик для подписок
+EXPORT_FIELDS = FIELDS + ('user',)
+
+
+def rows(queryset, *fields):
+    """Кортежи полей, прочитанные с сервера кусками по EXPORT_CHUNK_SIZE."""
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE
+    )
+
+
+def post_records(posts):
+    for pk, author, text, group, created in rows(
+        posts, 'pk', 'author__username', 'text', 'group__slug', 'created'
+    ):
+        yield {
+            'type': POST, 'id': pk, 'author': author, 'text': text,
+            'group': group or '', 'created': created.isoformat(),
+        }
+
+
+def comment_records(comments):
+    for pk, post_id, author, text, created in rows(
+        comments, 'pk', 'post_id', 'author__username', 'text', 'created'
+    ):
+        yield {
+            'type': COMMENT, 'id': pk, 'post': post_id, 'author': author,
+            'text': text, 'created': created.isoformat(),
+        }
+
+
+def follow_records(follows):
+    for user, author in rows(follows, 'user__username', 'author__username'):
+        yield {'type': FOLLOW, 'user': user, 'author': author}
+
+
+def records(user=None):
+    """
+    Посты, комментарии и подписки записями в формате импорта.
+    Для user - только его посты, комментарии и подписки.
+    """
+    posts, comments, follows = (
+        Post.objects.all(), Comment.objects.all(), Follow.objects.all()
+    )
+    if user is not None:
+        posts = posts.filter(author=user)
+        comments = comments.filter(author=user)
+        follows = follows.filter(user=user)
+    return chain(
+        post_records(posts),
+        comment_records(comments),
+        follow_records(follows),
+    )
+
+
+def jsonl_lines(records):
+    for record in records:
+        yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class Echo:
+    """Файл для csv.writer, который отдаёт строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(records):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for record in records:
+        yield writer.writerow(
+            [record.get(field, '') for field in EXPORT_FIELDS]
+        )
+
+
+# Формат: строки выгрузки и их тип содержимого
+FORMATS = {
+    'jsonl': (jsonl_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
+
+
+def buffered(lines, size=64 * 1024):
+    """Склеивает строки в куски около size символов для ответа сервера."""
+    chunk, length = [], 0
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(chunk)
+            chunk, length = [], 0
+    if chunk:
+        yield ''.join(chunk)
@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.shortcuts import get_object_or_404
+from django.template.defaultfilters import truncatewords
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+
+from .models import Group, Post, User
+
+
+class PostsFeed(Feed):
+    """Общая часть лент RSS: последние SYNDICATION_ITEMS постов."""
+
+    def item_title(self, post):
+        return truncatewords(post.text, settings.SYNDICATION_TITLE_WORDS)
+
+    def item_description(self, post):
+        return post.text
+
+    def item_link(self, post):
+        return reverse('posts:post_detail', args=[post.pk])
+
+    def item_pubdate(self, post):
+        return post.created
+
+    def item_author_name(self, post):
+        return post.author.get_full_name() or post.author.username
+
+    def item_categories(self, post):
+        return [post.group.title] if post.group else []
+
+
+class IndexFeed(PostsFeed):
+    title = 'Yatube: последние записи'
+    link = reverse_lazy('posts:index')
+    description = 'Последние обновления на сайте'
+
+    def items(self):
+        return Post.objects.select_related(
+            'author', 'group'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class GroupFeed(PostsFeed):
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, group):
+        return f'Yatube: {group.title}'
+
+    def link(self, group):
+        return reverse('posts:group_list', args=[group.slug])
+
+    def description(self, group):
+        return group.description
+
+    def items(self, group):
+        return group.posts.select_related(
+            'author', 'group'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class AuthorFeed(PostsFeed):
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, author):
+        return f'Yatube: {author.get_full_name() or author.username}'
+
+    def link(self, author):
+        return reverse('posts:profile', args=[author.username])
+
+    def description(self, author):
+        return f'Все посты пользователя {author.username}'
+
+    def items(self, author):
+        return author.posts.select_related(
+            'author', 'group'
+        )[:settings.SYNDICATION_ITEMS]
+
+
+class IndexAtomFeed(IndexFeed):
+    feed_type = Atom1Feed
+    subtitle = IndexFeed.description
+
+
+class GroupAtomFeed(GroupFeed):
+    feed_type = Atom1Feed
+    subtitle = GroupFeed.description
+
+
+class AuthorAtomFeed(AuthorFeed):
+    feed_type = Atom1Feed
+    subtitle = AuthorFeed.description
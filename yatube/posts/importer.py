@@ -0,0 +1,297 @@
+import csv
+import json
+from collections import Counter
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import timeline
+from .counters import change
+from .models import Comment, Group, Post, User, UserStats
+from .search import deferred_index
+from .utils import batched, feed_count_key
+from .versions import bump, version_key
+
+POST = 'post'
+COMMENT = 'comment'
+
+# Колонки CSV и ключи JSONL. Для комментария post - id поста,
+# который должен быть в базе или выше в том же файле
+FIELDS = ('type', 'id', 'author', 'text', 'group', 'post', 'created')
+
+
+def read_records(file, file_format):
+    """
+    Читает файл по строке: (номер строки, словарь полей).
+    Неразобранная строка JSONL приходит со словарём None.
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+        yield number, record if isinstance(record, dict) else None
+
+
+def parse_created(value):
+    if not value:
+        return timezone.now()
+    created = parse_datetime(str(value))
+    if created is None:
+        raise ValueError(f'не разобрана дата {value}')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created)
+    return created
+
+
+def insert_rows(model, rows):
+    """
+    Пишет строки (словари attname: значение, готовое для базы) через
+    executemany. bulk_create собирал бы SQL заново и готовил каждое
+    значение через поля модели - на импорте это основное время.
+    Недостающие поля берутся по умолчанию, строки с id и без пишутся
+    отдельными запросами.
+    """
+    ops = connection.ops
+    pk = model._meta.pk.attname
+    by_pk = {}
+    for row in rows:
+        by_pk.setdefault(pk in row, []).append(row)
+    for with_pk, rows in by_pk.items():
+        fields = [
+            field for field in model._meta.concrete_fields
+            if with_pk or not field.primary_key
+        ]
+        defaults = {
+            field.attname: field.get_db_prep_save(
+                field.get_default(), connection
+            )
+            for field in fields if not field.primary_key
+        }
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            ops.quote_name(model._meta.db_table),
+            ', '.join(ops.quote_name(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields))
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                [
+                    row[field.attname] if field.attname in row
+                    else defaults[field.attname]
+                    for field in fields
+                ]
+                for row in rows
+            ])
+
+
+class Importer:
+    """
+    Потоковый импорт постов и комментариев.
+
+    Строки пишутся пачками по batch_size, по batches_per_transaction
+    пачек в транзакции, поэтому в памяти лежит не больше одной
+    транзакции строк. Авторы и группы ищутся в словарях, прочитанных
+    один раз. Сигналы при такой записи не срабатывают: счётчики и ленты
+    подписок обновляются в той же транзакции и только по вставленным
+    строкам, кэши сбрасываются после неё.
+    """
+
+    def __init__(self, batch_size, batches_per_transaction,
+                 create_users=False, defer_index=False, on_error=None,
+                 on_commit=None):
+        self.batch_size = batch_size
+        self.batches_per_transaction = batches_per_transaction
+        self.create_users = create_users
+        self.defer_index = defer_index
+        self.on_error = on_error or (lambda number, message: None)
+        self.on_commit = on_commit or (lambda importer: None)
+        self.authors = dict(User.objects.values_list('username', 'pk'))
+        self.groups = dict(Group.objects.values_list('slug', 'pk'))
+        self.posts = self.comments = self.skipped = 0
+        self.explicit_ids = False
+
+    def author_id(self, username):
+        if username in self.authors:
+            return self.authors[username]
+        if not self.create_users or not username:
+            raise ValueError(f'нет автора «{username}»')
+        self.authors[username] = User.objects.create_user(
+            username=username
+        ).pk
+        return self.authors[username]
+
+    def group_id(self, slug):
+        if not slug:
+            return None
+        if slug not in self.groups:
+            raise ValueError(f'нет группы «{slug}»')
+        return self.groups[slug]
+
+    def build(self, record):
+        """
+        Модель и строка для insert_rows из записи файла,
+        ValueError - если запись не подходит.
+        """
+        if record is None:
+            raise ValueError('строка не разобрана')
+        kind = record.get('type') or POST
+        text = str(record.get('text') or '')
+        if not text.strip():
+            raise ValueError('пустой текст')
+        row = {
+            'text': text,
+            'author_id': self.author_id(str(record.get('author') or '')),
+            'created': connection.ops.adapt_datetimefield_value(
+                parse_created(record.get('created'))
+            ),
+        }
+        if kind == POST:
+            row['group_id'] = self.group_id(record.get('group'))
+            if record.get('id'):
+                row['id'] = int(record['id'])
+                self.explicit_ids = True
+            return Post, row
+        if kind == COMMENT:
+            if not record.get('post'):
+                raise ValueError('не указан пост')
+            row['post_id'] = int(record['post'])
+            return Comment, row
+        raise ValueError(f'неизвестный тип записи «{kind}»')
+
+    def rows(self, records):
+        for number, record in records:
+            try:
+                yield (number, *self.build(record))
+            except ValueError as error:
+                self.skip(number, str(error))
+
+    def skip(self, number, message):
+        self.skipped += 1
+        self.on_error(number, message)
+
+    def insert(self, batch, changed):
+        """
+        Пишет пачку: сначала посты, потом комментарии, чтобы
+        комментарии могли ссылаться на посты той же пачки.
+        """
+        posts = [row for _, model, row in batch if model is Post]
+        comments = [
+            (number, row) for number, model, row in batch
+            if model is Comment
+        ]
+        insert_rows(Post, posts)
+        self.posts += len(posts)
+        for post in posts:
+            changed['author'][post['author_id']] += 1
+            changed['group'][post['group_id']] += 1
+            if 'id' in post:
+                changed['ids'].append(post['id'])
+        if not comments:
+            return
+        commented = {
+            pk: (author_id, group_id)
+            for pk, author_id, group_id in Post.objects.filter(
+                pk__in={row['post_id'] for _, row in comments}
+            ).values_list('pk', 'author_id', 'group_id')
+        }
+        found = []
+        for number, comment in comments:
+            if comment['post_id'] not in commented:
+                self.skip(number, f'нет поста {comment["post_id"]}')
+                continue
+            found.append(comment)
+            author_id, group_id = commented[comment['post_id']]
+            changed['author'][author_id] += 0
+            changed['group'][group_id] += 0
+            changed['post'][comment['post_id']] += 1
+        insert_rows(Comment, found)
+        self.comments += len(found)
+
+    def run(self, records):
+        """Импортирует записи из read_records."""
+        chunks = batched(
+            batched(self.rows(records), self.batch_size),
+            self.batches_per_transaction
+        )
+        for chunk in chunks:
+            # id -> сколько строк добавлено: постов автору и группе,
+            # комментариев посту. Ноль - лента изменилась без новых постов
+            changed = {
+                'author': Counter(), 'group': Counter(), 'post': Counter(),
+                'ids': [],
+            }
+            with transaction.atomic():
+                index = (
+                    deferred_index(changed['ids']) if self.defer_index
+                    else nullcontext()
+                )
+                with index:
+                    last_id = Post.objects.aggregate(
+                        last_id=Max('pk')
+                    )['last_id'] or 0
+                    for batch in chunk:
+                        self.insert(batch, changed)
+                self.count(changed)
+                self.fan_out(last_id, changed['ids'])
+            self.forget(changed)
+            self.on_commit(self)
+
+    def count(self, changed):
+        """Сдвигает счётчики на число вставленных строк, как сигналы."""
+        counters = (
+            (UserStats, 'posts_count', changed['author']),
+            (Group, 'posts_count', changed['group']),
+            (Post, 'comments_count', changed['post']),
+        )
+        for model, field, deltas in counters:
+            for pk, delta in deltas.items():
+                if pk is not None and delta:
+                    change(model, pk, field, delta)
+
+    def fan_out(self, last_id, explicit_ids):
+        """
+        Раскладывает по лентам подписчиков только посты этой транзакции:
+        новые id выше прежнего наибольшего и явно заданные.
+        """
+        posts = Post.objects.filter(
+            Q(pk__gt=last_id) | Q(pk__in=explicit_ids)
+        ).values_list('pk', 'author_id', 'created').iterator(
+            chunk_size=settings.TIMELINE_BATCH_SIZE
+        )
+        timeline.fan_out_rows(posts)
+
+    def forget(self, changed):
+        """
+        Сбрасывает закэшированное по изменённым лентам и постам:
+        общий счётчик постов удаляется, версии поднимаются.
+        """
+        cache.delete(feed_count_key('index'))
+        bump(version_key('index'), *(
+            version_key(scope, pk)
+            for scope in ('author', 'group', 'post')
+            for pk in changed[scope] if pk is not None
+        ))
+
+    def finish(self):
+        """
+        Для вставленных с явным id постов сдвигает последовательность
+        первичных ключей, чтобы новые посты сайта не упёрлись в них.
+        """
+        if not self.explicit_ids:
+            return
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), [Post]):
+                cursor.execute(sql)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import FORMATS, records
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки в JSONL или CSV потоком, '
+        'в формате import_posts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--format', choices=tuple(FORMATS), default='jsonl',
+            help='Формат выгрузки.'
+        )
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, «-» - стандартный вывод.'
+        )
+        parser.add_argument(
+            '--user', help='Выгрузить только данные этого пользователя.'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+        lines = FORMATS[options['format']][0](records(user))
+        if options['output'] == '-':
+            self.stdout.writelines(lines)
+            return
+        try:
+            with open(
+                options['output'], 'w', encoding='utf-8', newline=''
+            ) as file:
+                file.writelines(lines)
+        except OSError as error:
+            raise CommandError(f'Не записать файл: {error}')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.uploads import placeholder
+
+
+class Command(BaseCommand):
+    help = 'Считает заглушки для картинок постов, загруженных раньше.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(
+            image_placeholder=''
+        ).only('image')
+        done = 0
+        for post in posts.iterator():
+            try:
+                with post.image.open('rb') as file:
+                    value = placeholder(file)
+            except OSError as error:
+                self.stderr.write(f'{post.image.name}: {error}')
+                continue
+            # update(), чтобы не трогать сигналы сохранения поста
+            Post.objects.filter(pk=post.pk).update(image_placeholder=value)
+            done += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Посчитано заглушек: {done}')
+        )
@@ -0,0 +1,105 @@
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import FIELDS, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из JSONL или CSV потоком, '
+        'пачками по несколько тысяч строк. Поля записи: '
+        + ', '.join(FIELDS) + '.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл .jsonl или .csv, «-» - стандартный ввод.'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла. По умолчанию по расширению, иначе jsonl.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+            help='Строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--batches-per-transaction', type=int,
+            default=settings.IMPORT_BATCHES_PER_TRANSACTION,
+            help='Пачек в одной транзакции.'
+        )
+        parser.add_argument(
+            '--create-users', action='store_true',
+            help='Создавать неизвестных авторов без пароля.'
+        )
+        parser.add_argument(
+            '--defer-search-index', action='store_true',
+            help=(
+                'Индексировать посты для поиска не построчно, а одним '
+                'запросом в конце каждой транзакции. Быстрее для больших '
+                'файлов.'
+            )
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['batches_per_transaction'] < 1:
+            raise CommandError('Размеры пачек должны быть больше нуля')
+        self.verbosity = options['verbosity']
+        path = options['path']
+        file_format = options['format'] or (
+            'csv' if Path(path).suffix.lower() == '.csv' else 'jsonl'
+        )
+        importer = Importer(
+            options['batch_size'],
+            options['batches_per_transaction'],
+            create_users=options['create_users'],
+            defer_index=options['defer_search_index'],
+            on_error=self.report_error,
+            on_commit=self.report_progress,
+        )
+        self.started = time.monotonic()
+        try:
+            self.read(importer, path, file_format)
+        except OSError as error:
+            raise CommandError(f'Не открыть файл: {error}')
+        except IntegrityError as error:
+            # Прошлые транзакции уже в базе, их явные id учитываем
+            importer.finish()
+            raise CommandError(
+                f'Транзакция отменена: {error}. До неё импортировано '
+                f'постов: {importer.posts}, комментариев: {importer.comments}'
+            )
+        elapsed = time.monotonic() - self.started
+        importer.finish()
+        rows = importer.posts + importer.comments
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Импортировано постов: {importer.posts}, комментариев: '
+                f'{importer.comments}, пропущено строк: {importer.skipped} '
+                f'за {elapsed:.1f} с ({rows / max(elapsed, 1e-6):.0f} строк/с)'
+            )
+        )
+
+    def read(self, importer, path, file_format):
+        if path == '-':
+            importer.run(read_records(sys.stdin, file_format))
+            return
+        with open(path, encoding='utf-8', newline='') as file:
+            importer.run(read_records(file, file_format))
+
+    def report_error(self, number, message):
+        self.stderr.write(f'Строка {number}: {message}')
+
+    def report_progress(self, importer):
+        if self.verbosity < 2:
+            return
+        rows = importer.posts + importer.comments
+        elapsed = time.monotonic() - self.started
+        self.stdout.write(
+            f'{rows} строк, {rows / max(elapsed, 1e-6):.0f} строк/с'
+        )
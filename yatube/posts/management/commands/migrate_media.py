@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from posts.counters import reconcile
+from posts.models import MediaFile, Post
+from posts.storage import is_hashed_name, post_image_storage
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов в хранилище по хэшу содержимого '
+        'и пересчитывает ссылки на файлы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-originals', action='store_true',
+            help='Не удалять файлы под старыми именами.'
+        )
+
+    def handle(self, *args, **options):
+        names = Post.objects.exclude(image='').order_by().values_list(
+            'image', flat=True
+        ).distinct()
+        moved = missing = 0
+        for name in [name for name in names if not is_hashed_name(name)]:
+            if not post_image_storage.exists(name):
+                self.stderr.write(f'Нет файла {name}')
+                missing += 1
+                continue
+            with post_image_storage.open(name) as content:
+                new_name = post_image_storage.save(name, content)
+            Post.objects.filter(image=name).update(image=new_name)
+            if not options['keep_originals']:
+                delete(ImageFile(name, post_image_storage))
+            moved += 1
+        # Ссылки считаются заново по постам: перенос шёл мимо сигналов
+        MediaFile.objects.bulk_create(
+            [
+                MediaFile(name=name) for name in names.all()
+                if is_hashed_name(name)
+            ],
+            ignore_conflicts=True
+        )
+        fixed = reconcile()['MediaFile.references']
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Перенесено файлов: {moved}, не найдено: {missing}, '
+                f'исправлено счётчиков ссылок: {fixed}'
+            )
+        )
+        if moved:
+            self.stdout.write(
+                'Миниатюры для новых имён создаст pregenerate_thumbnails'
+            )
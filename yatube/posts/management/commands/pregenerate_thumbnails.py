@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def generate(name):
+    thumbnails.generate_safely(name)
+    return name
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для уже загруженных картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу ядер.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=50,
+            help='Сколько картинок отдавать процессу за раз.'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by().values_list(
+                'image', flat=True
+            ).distinct()
+        )
+        # Дочерние процессы откроют собственные соединения с базой
+        connections.close_all()
+        done = 0
+        with ProcessPoolExecutor(max_workers=options['workers']) as pool:
+            for _ in pool.map(
+                generate, names, chunksize=options['chunk_size']
+            ):
+                done += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Обработано картинок: {done}')
+        )
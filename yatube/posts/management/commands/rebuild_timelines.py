@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+from posts.models import Follow, Timeline, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок по таблицам Follow и Post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Пользователи, чьи ленты пересобрать. По умолчанию все.'
+        )
+
+    def handle(self, *args, **options):
+        pushed = timeline.push_back()
+        if pushed:
+            self.stdout.write(f'Возвращено в раскладку авторов: {pushed}')
+        if options['usernames']:
+            follower_ids = User.objects.filter(
+                username__in=options['usernames']
+            ).values_list('pk', flat=True)
+        else:
+            follower_ids = Follow.objects.order_by().values_list(
+                'user_id', flat=True
+            ).union(
+                Timeline.objects.order_by().values_list(
+                    'follower_id', flat=True
+                )
+            )
+        rebuilt = 0
+        for follower_id in follower_ids:
+            timeline.rebuild(follower_id)
+            rebuilt += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересобрано лент: {rebuilt}')
+        )
@@ -0,0 +1,39 @@
+import logging
+
+from django.db import transaction
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+from .counters import change
+from .models import MediaFile
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+
+def acquire(name):
+    """Ещё один пост ссылается на файл."""
+    MediaFile.objects.get_or_create(name=name)
+    change(MediaFile, name, 'references', 1)
+
+
+def release(name):
+    """
+    Пост больше не ссылается на файл. Файл без ссылок удаляется вместе
+    с миниатюрами после коммита. Файлы, которых нет в MediaFile
+    (загруженные до общего хранилища), не удаляются никогда.
+    """
+    change(MediaFile, name, 'references', -1)
+    transaction.on_commit(lambda: delete_unreferenced(name))
+
+
+def delete_unreferenced(name):
+    # Строка удаляется только при нуле ссылок: если файл успели загрузить
+    # снова, счётчик уже не ноль и файл остаётся
+    deleted, _ = MediaFile.objects.filter(name=name, references=0).delete()
+    if not deleted:
+        return
+    try:
+        delete(ImageFile(name, post_image_storage))
+    except Exception:
+        logger.exception('Не удалось удалить файл %s', name)
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_media_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_placeholder',
+            field=models.CharField(blank=True, editable=False, help_text='Цвета градиента, который виден, пока грузится картинка', max_length=64, verbose_name='Заглушка картинки'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations
+
+FTS_TABLE = 'posts_post_fts'
+DEFERRAL_TABLE = 'posts_post_fts_deferral'
+
+CREATE = [
+    f'CREATE TABLE {DEFERRAL_TABLE} (id INTEGER PRIMARY KEY)',
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    f"""
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post
+    WHEN NOT EXISTS (SELECT 1 FROM {DEFERRAL_TABLE})
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+DROP = [
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    f"""
+    CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f'DROP TABLE IF EXISTS {DEFERRAL_TABLE}',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # Индекс построен на FTS5, он есть только в SQLite
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE), run(DROP)),
+    ]
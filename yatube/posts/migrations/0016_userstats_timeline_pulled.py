@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_THRESHOLD
+    ).update(timeline_pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search_deferral'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='timeline_pulled',
+            field=models.BooleanField(
+                db_index=True,
+                default=False,
+                help_text=(
+                    'Посты автора не раскладываются по лентам подписчиков'
+                ),
+                verbose_name='Посты читаются при запросе ленты',
+            ),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
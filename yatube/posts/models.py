@@ -2,21 +2,30 @@ from django.contrib.auth import get_user_model
 
 from django.db import models
 from django.conf import settings
-from core.models import CreatedModel
+from core.models import CounterFieldsMixin, CreatedModel
+
+from .storage import post_image_storage
 
 User = get_user_model()
 
 
-class Group(models.Model):
+class Group(CounterFieldsMixin, models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('posts_count',)
 
     def __str__(self):
         return self.title
 
 
-class Post(CreatedModel):
+class Post(CounterFieldsMixin, CreatedModel):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -39,15 +48,51 @@ class Post(CreatedModel):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=post_image_storage,
         blank=True,
         help_text='Картинка'
     )
+    image_placeholder = models.CharField(
+        'Заглушка картинки',
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text='Цвета градиента, который виден, пока грузится картинка'
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('comments_count',)
 
     def __str__(self) -> str:
         return self.text[:settings.LEN_TEXT_IN_STR]
 
+    @property
+    def placeholder_background(self):
+        """CSS-фон из image_placeholder для атрибута style."""
+        if not self.image_placeholder:
+            return ''
+        colors = ', '.join(
+            f'#{color}' for color in self.image_placeholder.split()
+        )
+        return f'linear-gradient(90deg, {colors})'
+
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['author', '-created', '-id'],
+                name='post_author_created'
+            ),
+            models.Index(
+                fields=['group', '-created', '-id'],
+                name='post_group_created'
+            ),
+            models.Index(fields=['-created', '-id'], name='post_created'),
+        ]
 
 
 class Comment(CreatedModel):
@@ -71,6 +116,12 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(
+                fields=['post', '-created', '-id'],
+                name='comment_post_created'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -88,3 +139,85 @@ class Follow(models.Model):
 
     def __str__(self) -> str:
         return f'Подписчик^{self.user}, автор: {self.author}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'],
+                name='unique_follow_user_author'
+            ),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя: посты, подписчики и подписки."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        db_index=True
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0
+    )
+    timeline_pulled = models.BooleanField(
+        'Посты читаются при запросе ленты',
+        default=False,
+        db_index=True,
+        help_text='Посты автора не раскладываются по лентам подписчиков',
+    )
+
+    def __str__(self) -> str:
+        return f'Счётчики {self.user}'
+
+
+class Timeline(models.Model):
+    """Лента подписок: посты авторов, разложенные по подписчикам."""
+    follower = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    created = models.DateTimeField('Дата создания поста')
+
+    def __str__(self) -> str:
+        return f'Лента {self.follower}: пост {self.post_id}'
+
+    class Meta:
+        ordering = ['-created', '-post']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['follower', 'post'],
+                name='unique_timeline_follower_post'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['follower', '-created', '-post'],
+                name='timeline_follower_created'
+            ),
+        ]
+
+
+class MediaFile(models.Model):
+    """Картинка в хранилище и число постов, которые на неё ссылаются."""
+    name = models.CharField('Имя файла', max_length=100, primary_key=True)
+    references = models.PositiveIntegerField('Количество ссылок', default=0)
+
+    def __str__(self) -> str:
+        return self.name
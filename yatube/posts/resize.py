@@ -0,0 +1,189 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .storage import post_image_storage
+
+SPEC_RE = re.compile(r'^(?P<width>\d{1,4})x(?P<height>\d{1,4})(?P<crop>c?)$')
+
+signer = signing.Signer(salt='posts.resize')
+
+executor = None
+# Рендеры в работе: ключ варианта -> Future. Одновременные запросы одного
+# варианта ждут один и тот же рендер
+in_flight = {}
+in_flight_lock = threading.Lock()
+# Примерный размер дискового кэша, считается при первом обращении
+cache_size = None
+cache_size_lock = threading.Lock()
+
+
+class InvalidSpec(ValueError):
+    pass
+
+
+def make_spec(width, height, crop=False):
+    return f'{width}x{height}{"c" if crop else ""}'
+
+
+def parse_spec(spec):
+    """'480x320c' -> (480, 320, True). Размеры ограничены RESIZE_MAX_SIZE."""
+    match = SPEC_RE.match(spec)
+    if match is None:
+        raise InvalidSpec(spec)
+    width, height = int(match['width']), int(match['height'])
+    max_width, max_height = settings.RESIZE_MAX_SIZE
+    if not (0 < width <= max_width and 0 < height <= max_height):
+        raise InvalidSpec(spec)
+    return width, height, bool(match['crop'])
+
+
+def sign(spec, name):
+    return signer.signature(f'{spec}/{name}')
+
+
+def check_signature(spec, name, signature):
+    return signing.constant_time_compare(sign(spec, name), signature)
+
+
+def resize_url(name, width, height, crop=False):
+    """Подписанная ссылка на картинку поста нужного размера."""
+    spec = make_spec(width, height, crop)
+    return reverse('posts:resized_image', kwargs={
+        'spec': spec, 'signature': sign(spec, name), 'name': name,
+    })
+
+
+def output_format(name):
+    return 'PNG' if name.lower().endswith('.png') else 'JPEG'
+
+
+def cache_path(spec, name):
+    """Файл варианта в дисковом кэше, разложенный по подкаталогам."""
+    digest = hashlib.sha256(f'{spec}/{name}'.encode()).hexdigest()
+    extension = 'png' if output_format(name) == 'PNG' else 'jpg'
+    return os.path.join(
+        settings.RESIZE_CACHE_DIR, digest[:2], f'{digest}.{extension}'
+    )
+
+
+def render(spec, name, path):
+    """Уменьшает картинку и атомарно кладёт результат в кэш."""
+    width, height, crop = parse_spec(spec)
+    with post_image_storage.open(name) as source:
+        with Image.open(source) as image:
+            image.draft('RGB', (width, height))
+            if crop:
+                image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                image = image.copy()
+                image.thumbnail((width, height), Image.LANCZOS)
+    format_ = output_format(name)
+    if format_ == 'JPEG':
+        image = image.convert('RGB')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Пишем во временный файл и переименовываем: читатели не увидят
+    # недописанный файл, а гонка двух процессов безвредна
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as output:
+            image.save(
+                output, format_, quality=settings.RESIZE_QUALITY,
+                optimize=True
+            )
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    add_to_cache(os.path.getsize(path))
+    return path
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.RESIZE_WORKERS,
+            thread_name_prefix='resize'
+        )
+    return executor
+
+
+def get_resized(spec, name):
+    """
+    Путь к готовому варианту. Если его нет в кэше, он рендерится в пуле
+    потоков, а одновременные запросы того же варианта ждут этот рендер.
+    """
+    path = cache_path(spec, name)
+    if os.path.exists(path):
+        touch(path)
+        return path
+    with in_flight_lock:
+        future = in_flight.get(path)
+        started = future is None
+        if started:
+            future = get_executor().submit(render, spec, name, path)
+            in_flight[path] = future
+    if started:
+        # Вне блокировки: у готового future колбэк вызывается сразу
+        future.add_done_callback(lambda _: forget(path))
+    return future.result(timeout=settings.RESIZE_TIMEOUT)
+
+
+def forget(path):
+    with in_flight_lock:
+        in_flight.pop(path, None)
+
+
+def touch(path):
+    """Отмечает обращение к варианту: вытесняются давно не читанные."""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def cached_files():
+    for root, _, files in os.walk(settings.RESIZE_CACHE_DIR):
+        for filename in files:
+            path = os.path.join(root, filename)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            yield stat.st_mtime, stat.st_size, path
+
+
+def add_to_cache(size):
+    """Учитывает новый файл и при превышении бюджета чистит кэш."""
+    global cache_size
+    with cache_size_lock:
+        if cache_size is None:
+            cache_size = sum(size for _, size, _ in cached_files())
+        else:
+            cache_size += size
+        if cache_size > settings.RESIZE_CACHE_MAX_BYTES:
+            cache_size = evict(settings.RESIZE_CACHE_MAX_BYTES * 0.9)
+
+
+def evict(budget):
+    """Удаляет самые давние по обращению файлы, пока кэш не влезет в бюджет."""
+    files = sorted(cached_files())
+    total = sum(size for _, size, _ in files)
+    for _, size, path in files:
+        if total <= budget:
+            break
+        try:
+            os.unlink(path)
+        except OSError:
+            continue
+        total -= size
+    return total
@@ -0,0 +1,164 @@
+import re
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .utils import NEXT, CursorPaginator, batched
+
+# Полнотекстовый индекс постов: виртуальная таблица FTS5 поверх
+# posts_post, её поддерживают триггеры из миграции 0014_post_search
+FTS_TABLE = 'posts_post_fts'
+
+# Пока в этой таблице есть строка, триггер вставки из миграции
+# 0015_post_search_deferral не индексирует новые посты
+DEFERRAL_TABLE = 'posts_post_fts_deferral'
+
+WORD_RE = re.compile(r'\w+')
+
+# Границы совпадений в сниппете: символы, которых нет в тексте постов
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+
+def match_expression(query):
+    """
+    Запрос пользователя -> выражение MATCH для FTS5: все слова
+    обязательны, последнее ищется и как начало слова. Операторы FTS5
+    из запроса не проходят, потому что каждое слово берётся в кавычки.
+    """
+    words = WORD_RE.findall(query)[:settings.SEARCH_MAX_WORDS]
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def filter_matching(queryset, query):
+    """
+    Оставляет в queryset постов только подходящие под запрос.
+    Подзапрос пишется в WHERE как есть: RawSQL в pk__in SQLite
+    получила бы в двойных скобках и вернула бы только первую строку.
+    """
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        where=[
+            f'"{table}"."id" IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)'
+        ],
+        params=[match_expression(query)]
+    )
+
+
+@contextmanager
+def deferred_index(post_ids):
+    """
+    Посты, вставленные внутри блока, индексируются на выходе одним
+    запросом, а не триггером по строке. Блок должен быть внутри
+    транзакции: метка, которая выключает триггер, пишется в ней же
+    и снимается до коммита, поэтому другие соединения её не видят,
+    а при сбое она откатывается вместе с постами. Индексируются посты
+    с id больше прежнего наибольшего и с id из post_ids: туда нужно
+    добавить id, явно заданные при вставке.
+    """
+    if connection.vendor != 'sqlite':
+        yield
+        return
+    with connection.cursor() as cursor:
+        # Сначала запись: транзакция берёт блокировку на запись,
+        # и посты других соединений не попадут между ней и max(id)
+        cursor.execute(f'INSERT INTO {DEFERRAL_TABLE} DEFAULT VALUES')
+        cursor.execute('SELECT coalesce(max(id), 0) FROM posts_post')
+        last_id = cursor.fetchone()[0]
+    yield
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {FTS_TABLE}(rowid, text) SELECT id, text '
+            f'FROM posts_post WHERE id > %s',
+            [last_id]
+        )
+        for batch in batched(
+            sorted(pk for pk in post_ids if pk <= last_id), 500
+        ):
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) SELECT id, text '
+                f'FROM posts_post WHERE id IN '
+                f'({", ".join(["%s"] * len(batch))})',
+                batch
+            )
+        cursor.execute(f'DELETE FROM {DEFERRAL_TABLE}')
+
+
+def highlight(snippet):
+    """Экранирует сниппет и выделяет совпадения тегом <mark>."""
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+class SearchPaginator(CursorPaginator):
+    """
+    Курсорный пагинатор результатов поиска по ключу (ранг bm25, id).
+
+    Лучшие совпадения идут первыми: у bm25 в FTS5 чем меньше, тем лучше.
+    Посты грузятся одним запросом по id из object_list, у каждого
+    появляются rank и snippet с подсвеченными словами.
+    """
+    key_type = float
+    exact_without_key = False
+
+    def __init__(self, object_list, per_page, query=''):
+        super().__init__(object_list, per_page)
+        self.match = match_expression(query)
+
+    def cursor_values(self, obj):
+        return obj.rank, obj.pk
+
+    def bounded_count(self, limit):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM (SELECT 1 FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s LIMIT %s)',
+                (self.match, limit)
+            )
+            return cursor.fetchone()[0]
+
+    def _fetch(self, direction, values):
+        if not self.match:
+            return []
+        if direction == NEXT:
+            seek, ordering = '>', 'ASC'
+        else:
+            seek, ordering = '<', 'DESC'
+        where, params = '', [self.match]
+        if values is not None:
+            where = f'AND (rank {seek} %s OR (rank = %s AND rowid {seek} %s))'
+            params += [values[0], values[0], values[1]]
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, rank, snippet({FTS_TABLE}, 0, %s, %s, '
+                f'%s, %s) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'{where} ORDER BY rank {ordering}, rowid {ordering} '
+                f'LIMIT %s',
+                [
+                    MARK_START, MARK_END, '…', settings.SEARCH_SNIPPET_WORDS
+                ] + params
+            )
+            rows = cursor.fetchall()
+        posts = self.object_list.in_bulk([pk for pk, _, _ in rows])
+        items = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                items.append(post)
+        return items
@@ -0,0 +1,291 @@
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import media, thumbnails, timeline
+from .counters import change
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .uploads import placeholder
+from .utils import feed_count_key
+from .versions import bump, lookup_key, version_key
+
+# Поля пользователя, которые выводятся в лентах
+USER_DISPLAY_FIELDS = {'username', 'first_name', 'last_name'}
+
+# id постов, которые сейчас удаляются в этом потоке
+_deleting = threading.local()
+
+
+def deleting_posts():
+    if not hasattr(_deleting, 'post_ids'):
+        _deleting.post_ids = set()
+    return _deleting.post_ids
+
+
+def change_count(key, delta):
+    """Сдвигает счётчик в кэше. Холодный счётчик не трогаем."""
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        pass
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, **kwargs):
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_group(sender, instance, **kwargs):
+    """Запоминает группу и картинку поста до редактирования."""
+    instance._old_group_id = None
+    instance._old_image = ''
+    if instance.pk is not None:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, '')
+
+
+@receiver(pre_save, sender=Post)
+def compute_image_placeholder(sender, instance, **kwargs):
+    """Для только что загруженной картинки считает заглушку."""
+    if not instance.image:
+        instance.image_placeholder = ''
+    elif not instance.image._committed:
+        instance.image_placeholder = placeholder(instance.image)
+
+
+@receiver(post_save, sender=Post)
+def pregenerate_thumbnails(sender, instance, **kwargs):
+    name = instance.image.name
+    if name and name != getattr(instance, '_old_image', ''):
+        transaction.on_commit(lambda: thumbnails.schedule(name))
+
+
+@receiver(post_save, sender=Post)
+def count_image_references(sender, instance, **kwargs):
+    name = instance.image.name
+    old_name = getattr(instance, '_old_image', '')
+    if name != old_name:
+        if name:
+            media.acquire(name)
+        if old_name:
+            media.release(old_name)
+
+
+@receiver(pre_delete, sender=Post)
+def mark_deleting_post(sender, instance, **kwargs):
+    """
+    Комментарии удаляемого поста удаляются каскадом, и сигналы
+    приходят на каждый. Счётчик комментариев и версии такого поста
+    трогать незачем: версии один раз поднимет сигнал самого поста.
+    """
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def unmark_deleted_post(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def release_deleted_image(sender, instance, **kwargs):
+    if instance.image.name:
+        media.release(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+def update_post_counters(sender, instance, created, **kwargs):
+    if created:
+        change(UserStats, instance.author_id, 'posts_count', 1)
+        if instance.group_id is not None:
+            change(Group, instance.group_id, 'posts_count', 1)
+        return
+    old_group_id = getattr(instance, '_old_group_id', None)
+    if old_group_id != instance.group_id:
+        if old_group_id is not None:
+            change(Group, old_group_id, 'posts_count', -1)
+        if instance.group_id is not None:
+            change(Group, instance.group_id, 'posts_count', 1)
+
+
+@receiver(post_delete, sender=Post)
+def update_deleted_post_counters(sender, instance, **kwargs):
+    change(UserStats, instance.author_id, 'posts_count', -1)
+    if instance.group_id is not None:
+        change(Group, instance.group_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Comment)
+def update_comment_counter(sender, instance, created, **kwargs):
+    if created:
+        change(Post, instance.post_id, 'comments_count', 1)
+
+
+@receiver(post_delete, sender=Comment)
+def update_deleted_comment_counter(sender, instance, **kwargs):
+    if instance.post_id not in deleting_posts():
+        change(Post, instance.post_id, 'comments_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def update_follow_counters(sender, instance, created, **kwargs):
+    if created:
+        change(UserStats, instance.author_id, 'followers_count', 1)
+        change(UserStats, instance.user_id, 'following_count', 1)
+
+
+@receiver(post_delete, sender=Follow)
+def update_unfollow_counters(sender, instance, **kwargs):
+    change(UserStats, instance.author_id, 'followers_count', -1)
+    change(UserStats, instance.user_id, 'following_count', -1)
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    """
+    Общий счётчик постов нужен админке. Ленты количество не выводят,
+    поэтому счётчики групп, авторов и подписок не ведутся.
+    """
+    if created:
+        change_count(feed_count_key('index'), 1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, **kwargs):
+    """Новый пост раскладывается по лентам подписчиков автора."""
+    if created:
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_count(feed_count_key('index'), -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        timeline.author_followed(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+def bump_post_versions(post, *group_ids):
+    keys = [
+        version_key('index'),
+        version_key('author', post.author_id),
+        version_key('post', post.pk),
+    ]
+    keys += [
+        version_key('group', pk) for pk in {post.group_id, *group_ids}
+        if pk is not None
+    ]
+    bump(*keys)
+
+
+@receiver(post_save, sender=Post)
+def bump_saved_post_versions(sender, instance, **kwargs):
+    bump_post_versions(instance, getattr(instance, '_old_group_id', None))
+
+
+@receiver(post_delete, sender=Post)
+def bump_deleted_post_versions(sender, instance, **kwargs):
+    bump_post_versions(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_versions(sender, instance, **kwargs):
+    # Если пост удаляется целиком, версии поднимет его собственный сигнал
+    if instance.post_id in deleting_posts():
+        return
+    post = Post.objects.filter(pk=instance.post_id).only(
+        'author_id', 'group_id'
+    ).first()
+    if post is not None:
+        bump_post_versions(post)
+
+
+@receiver(pre_save, sender=Group)
+def remember_group_slug(sender, instance, **kwargs):
+    """Запоминает slug до правки: его ключ поиска pk тоже сбросится."""
+    instance._old_slug = None
+    if instance.pk is not None:
+        instance._old_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+@receiver(pre_save, sender=User)
+def remember_user_display(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает выводимые поля до правки: версии поднимутся, только если
+    они изменились, а ключ поиска pk по старому username сбросится.
+    """
+    instance._old_display = None
+    if instance.pk is None or (
+        update_fields and not USER_DISPLAY_FIELDS & set(update_fields)
+    ):
+        return
+    instance._old_display = User.objects.filter(
+        pk=instance.pk
+    ).values(*USER_DISPLAY_FIELDS).first()
+
+
+def forget_lookups(kind, *values):
+    cache.delete_many({
+        lookup_key(kind, value) for value in values if value is not None
+    })
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group_versions(sender, instance, **kwargs):
+    forget_lookups(
+        'group_pk', instance.slug, getattr(instance, '_old_slug', None)
+    )
+    bump(version_key('groups'), version_key('group', instance.pk))
+
+
+@receiver(post_save, sender=User)
+def bump_user_versions(sender, instance, created, **kwargs):
+    """
+    Новый пользователь ещё нигде не выводится, а смена пароля или
+    входа на ленты не влияет: версии поднимаются, только когда
+    изменилось имя.
+    """
+    old = getattr(instance, '_old_display', None)
+    if created or old is None:
+        return
+    if all(getattr(instance, name) == old[name] for name in old):
+        return
+    forget_lookups('author_pk', instance.username, old['username'])
+    bump(version_key('users'), version_key('author', instance.pk))
+
+
+@receiver(post_delete, sender=User)
+def forget_deleted_user(sender, instance, **kwargs):
+    """Страница удалённого автора не должна отдаваться из кэша."""
+    forget_lookups('author_pk', instance.username)
+    bump(version_key('author', instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_versions(sender, instance, **kwargs):
+    """На странице автора выводятся счётчики подписчиков и подписок."""
+    bump(
+        version_key('author', instance.author_id),
+        version_key('author', instance.user_id)
+    )
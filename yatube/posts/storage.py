@@ -0,0 +1,75 @@
+import hashlib
+import posixpath
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+# Символов хэша в имени каждого вложенного каталога
+SHARD_WIDTH = 2
+
+
+def content_hash(content):
+    """sha256 содержимого файла, читается по частям."""
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def shards(digest):
+    """Имена вложенных каталогов для файла с таким хэшем."""
+    return [
+        digest[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH]
+        for i in range(settings.MEDIA_SHARD_DEPTH)
+    ]
+
+
+def hashed_name(name, digest):
+    """
+    posts/photo.JPG -> posts/ab/cd/abcd...ef.jpg: каталог из upload_to,
+    вложенные каталоги по началу хэша, имя из хэша и расширения.
+    """
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    return posixpath.join(directory, *shards(digest), digest + extension)
+
+
+def is_hashed_name(name):
+    """Лежит ли файл уже под именем из хэша содержимого."""
+    parts = name.split('/')
+    depth = settings.MEDIA_SHARD_DEPTH
+    digest = posixpath.splitext(parts[-1])[0]
+    return (
+        len(parts) > depth
+        and len(digest) == 64
+        and all(char in '0123456789abcdef' for char in digest)
+        and parts[-depth - 1:-1] == shards(digest)
+    )
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит файлы под именем из хэша содержимого, разложенными по
+    вложенным каталогам. Одинаковые файлы хранятся в одном экземпляре:
+    если файл с таким содержимым уже есть, save просто возвращает его имя.
+    Удалять такие файлы можно только когда на них никто не ссылается,
+    этим занимается posts.media.
+    """
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        return self._save(name, content)
+
+
+post_image_storage = ContentAddressedStorage()
@@ -0,0 +1,16 @@
+from django import template
+
+from posts.resize import resize_url
+
+register = template.Library()
+
+
+@register.simple_tag
+def resized_url(image, width, height, crop=False):
+    """
+    {% resized_url post.image 480 320 crop=True %} - ссылка на картинку
+    нужного размера, без новой геометрии в настройках миниатюр.
+    """
+    if not image:
+        return ''
+    return resize_url(image.name, width, height, crop)
@@ -0,0 +1,84 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..admin import PostAdmin
+from ..models import Group, Post, User
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='boss', email='boss@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(
+                title=f'Группа {i}', slug=f'group-{i}', description='-'
+            )
+            for i in range(3)
+        ]
+        cls.posts = [
+            Post.objects.create(
+                author=cls.admin, text=f'Пост {i}',
+                group=cls.groups[i % len(cls.groups)]
+            )
+            for i in range(5)
+        ]
+        cls.url = reverse('admin:posts_post_changelist')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get(self, per_page, **params):
+        with mock.patch.object(PostAdmin, 'list_per_page', per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url, params)
+        return response, len(queries)
+
+    def test_cursor_pages(self):
+        """Список листается курсором от новых постов к старым."""
+        response, _ = self.get(2)
+        cl = response.context['cl']
+        self.assertEqual(list(cl.result_list), self.posts[:-3:-1])
+        cursor = cl.cursor_page.next_cursor
+        response, _ = self.get(2, cursor=cursor)
+        self.assertEqual(
+            list(response.context['cl'].result_list), self.posts[-3:-5:-1]
+        )
+        self.assertContains(response, 'Предыдущая')
+
+    def test_queries_do_not_grow_with_rows(self):
+        """Число запросов не зависит от числа строк на странице."""
+        self.get(2)
+        _, two_rows = self.get(2)
+        _, four_rows = self.get(4)
+        self.assertEqual(two_rows, four_rows)
+
+    def test_column_ordering_keeps_page_numbers(self):
+        """При сортировке по колонке остаётся обычная пагинация."""
+        response, _ = self.get(2, o='1')
+        cl = response.context['cl']
+        self.assertIsNone(cl.cursor_page)
+        self.assertEqual(len(cl.result_list), 2)
+
+    def test_list_editable_saves_group(self):
+        """Группу можно поменять прямо в списке."""
+        post = self.posts[-1]
+        with mock.patch.object(PostAdmin, 'list_per_page', 1):
+            response = self.client.post(self.url, {
+                'form-TOTAL_FORMS': 1,
+                'form-INITIAL_FORMS': 1,
+                'form-0-id': post.pk,
+                'form-0-group': self.groups[0].pk,
+                '_save': 'Сохранить',
+            })
+        self.assertEqual(response.status_code, 302)
+        post.refresh_from_db()
+        self.assertEqual(post.group, self.groups[0])
@@ -0,0 +1,247 @@
+from unittest import mock
+
+from django.core.cache import cache, caches
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..versions import bump, get_versions, version_key
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='writer', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='api', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(3)
+        ]
+        cls.comment = Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_posts_cursor_pages(self):
+        """Список постов листается курсором от новых к старым."""
+        url = reverse('posts:api_posts')
+        response = self.client.get(url, {'limit': 2}).json()
+        self.assertEqual(
+            [post['id'] for post in response['results']],
+            [self.posts[2].pk, self.posts[1].pk]
+        )
+        self.assertIsNone(response['previous'])
+        response = self.client.get(
+            url, {'limit': 2, 'cursor': response['next']}
+        ).json()
+        self.assertEqual(
+            [post['id'] for post in response['results']], [self.posts[0].pk]
+        )
+        self.assertIsNone(response['next'])
+
+    def test_fields_and_include(self):
+        """fields= сужает запрос, include= добавляет связанные объекты."""
+        url = reverse('posts:api_group_posts', args=['api'])
+        self.client.get(url)
+        # Страница постов и по запросу in_bulk на авторов и группы
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                url, {'fields': 'id,author', 'include': 'author,group'}
+            )
+        data = response.json()
+        self.assertEqual(
+            data['results'][0],
+            {'id': self.posts[2].pk, 'author': self.author.pk}
+        )
+        self.assertEqual(data['included']['users'], [{
+            'id': self.author.pk, 'username': 'writer',
+            'first_name': 'Лев', 'last_name': 'Толстой',
+        }])
+        self.assertEqual(data['included']['groups'][0]['slug'], 'api')
+        self.assertIn('Лев'.encode(), response.content)
+
+    def test_objects(self):
+        """Пост, комментарии, группы и профиль."""
+        post = self.posts[0]
+        data = self.client.get(
+            reverse('posts:api_post', args=[post.pk])
+        ).json()['result']
+        self.assertEqual(data['text'], 'Пост 0')
+        self.assertEqual(data['comments_count'], 1)
+        self.assertIsNone(data['image'])
+        comments = self.client.get(
+            reverse('posts:api_post_comments', args=[post.pk]),
+            {'include': 'author'}
+        ).json()
+        self.assertEqual(comments['results'][0]['text'], 'Комментарий')
+        self.assertEqual(
+            comments['included']['users'][0]['username'], 'reader'
+        )
+        groups = self.client.get(
+            reverse('posts:api_groups'), {'fields': 'slug'}
+        ).json()
+        self.assertEqual(groups['results'], [{'slug': 'api'}])
+        profile = self.client.get(
+            reverse('posts:api_profile', args=['writer'])
+        ).json()['result']
+        self.assertEqual(profile['posts_count'], 3)
+        self.assertEqual(profile['followers_count'], 1)
+
+    def test_follow_feed(self):
+        """Лента подписок только для вошедших."""
+        url = reverse('posts:api_follow')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.client.force_login(self.reader)
+        data = self.client.get(url, {'fields': 'id'}).json()
+        self.assertEqual(
+            data['results'],
+            [{'id': post.pk} for post in reversed(self.posts)]
+        )
+
+    def test_errors(self):
+        """Ошибки в параметрах и несуществующие объекты - JSON."""
+        url = reverse('posts:api_posts')
+        for params in ({'fields': 'secret'}, {'include': 'x'},
+                       {'limit': '0'}, {'limit': '\u00b2'},
+                       {'limit': '9' * 5000}):
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+        response = self.client.get(reverse('posts:api_post', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Не найдено'})
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+    def test_renamed_slug_and_username_forgotten(self):
+        """После переименования старые slug и username отдают 404."""
+        group = Group.objects.create(title='Старая', slug='old-slug')
+        user = User.objects.create_user(username='old-name')
+        pages = (
+            ('posts:api_group_posts', group, 'slug', 'new-slug'),
+            ('posts:api_profile_posts', user, 'username', 'new-name'),
+        )
+        for name, obj, field, value in pages:
+            with self.subTest(page=name):
+                old_url = reverse(name, args=[getattr(obj, field)])
+                self.assertEqual(self.client.get(old_url).status_code, 200)
+                setattr(obj, field, value)
+                obj.save()
+                self.assertEqual(self.client.get(old_url).status_code, 404)
+                self.assertEqual(
+                    self.client.get(reverse(name, args=[value])).status_code,
+                    200
+                )
+
+    def test_deleted_user_forgotten(self):
+        """После удаления пользователя его страницы отдают 404."""
+        user = User.objects.create_user(username='leaving')
+        url = reverse('posts:api_profile_posts', args=['leaving'])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        user.delete()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_user_versions_bumped_only_by_name(self):
+        """Регистрация и смена пароля не сбрасывают кэш пользователей."""
+        users = version_key('users')
+        version, = get_versions(users)
+        user = User.objects.create_user(username='newcomer')
+        user.set_password('secret')
+        user.save()
+        self.assertEqual(cache.get(users), version)
+        user.first_name = 'Анна'
+        user.save()
+        self.assertNotEqual(cache.get(users), version)
+
+    def test_batch(self):
+        """Пакет постов: порядок ids, промахи, повторный запрос из кэша."""
+        url = reverse('posts:api_posts_batch')
+        ids = f'{self.posts[2].pk},999,{self.posts[0].pk},{self.posts[2].pk}'
+        params = {'ids': ids, 'fields': 'id,text', 'include': 'author,group'}
+        with self.assertNumQueries(1):
+            data = self.client.get(url, params).json()
+        self.assertEqual(data['results'], [
+            {'id': self.posts[2].pk, 'text': 'Пост 2'},
+            {'id': self.posts[0].pk, 'text': 'Пост 0'},
+        ])
+        self.assertEqual(data['missing'], [999])
+        self.assertEqual(
+            [user['username'] for user in data['included']['users']],
+            ['writer']
+        )
+        self.assertEqual(data['included']['groups'][0]['slug'], 'api')
+        with self.assertNumQueries(0):
+            self.client.get(url, params)
+        # Правка поста - промах только по нему
+        post = Post.objects.get(pk=self.posts[0].pk)
+        post.text = 'Правка'
+        post.save()
+        with self.assertNumQueries(1):
+            data = self.client.get(url, params).json()
+        self.assertEqual(data['results'][1]['text'], 'Правка')
+        for ids in ('a,b', '\u00b2', '0', str(2 ** 63), '9' * 5000):
+            with self.subTest(ids=ids[:20]):
+                self.assertEqual(
+                    self.client.get(url, {'ids': ids}).status_code, 400
+                )
+
+    def test_cold_batch_cache_round_trips(self):
+        """
+        Холодный пакет обходится несколькими обращениями к кэшу,
+        сколько бы несуществующих id в нём ни было.
+        """
+        backend = caches['default']
+        calls, depth = [], []
+
+        def counted(name, method):
+            def wrapper(*args, **kwargs):
+                # get_many в LocMemCache сам вызывает get: их не считаем
+                if not depth:
+                    calls.append(name)
+                depth.append(name)
+                try:
+                    return method(*args, **kwargs)
+                finally:
+                    depth.pop()
+            return wrapper
+
+        for name in ('get', 'get_many', 'set', 'set_many', 'add', 'incr'):
+            patcher = mock.patch.object(
+                backend, name, counted(name, getattr(backend, name))
+            )
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        ids = ','.join(str(pk) for pk in range(1, 301))
+        self.client.get(reverse('posts:api_posts_batch'), {'ids': ids})
+        # Холодные версии создаются по add: для пользователей, групп,
+        # ленты и трёх существующих постов, но не для остальных 297 id
+        self.assertEqual(calls, [
+            'get_many', 'add', 'add', 'add', 'get_many', 'get_many',
+            'get_many', 'add', 'add', 'add', 'set_many',
+        ])
+        self.assertIsNone(cache.get(version_key('post', 300)))
+
+    def test_cold_version_keeps_concurrent_bump(self):
+        """Холодная версия не затирает ту, что поднял другой процесс."""
+        key = version_key('post', 1)
+        add = cache.add
+
+        def racing_add(*args, **kwargs):
+            bump(key)
+            return add(*args, **kwargs)
+
+        with mock.patch.object(cache, 'add', racing_add):
+            version, = get_versions(key)
+        self.assertEqual(version, cache.get(key))
@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User, UserStats
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='counters', description='Описание'
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_and_comment_counters(self):
+        """Счётчики постов и комментариев меняются вместе с данными."""
+        post = Post.objects.create(
+            text='Пост', author=self.author, group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        post.delete()
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_edit_keeps_comment_counter(self):
+        """Сохранение устаревшего поста не затирает счётчик."""
+        post = Post.objects.create(text='Пост', author=self.author)
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        post.text = 'Правка'
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_post_delete_cost_independent_of_comments(self):
+        """Удаление поста не тратит запросы на каждый комментарий."""
+        queries = []
+        for comments in (1, 5):
+            post = Post.objects.create(text='Пост', author=self.author)
+            Comment.objects.bulk_create(
+                Comment(post=post, author=self.reader, text='Да')
+                for _ in range(comments)
+            )
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        Follow.objects.all().delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+
+    def test_profile_reads_stored_counters(self):
+        """Профиль берёт количество постов из счётчика, без COUNT."""
+        UserStats.objects.filter(user=self.author).update(posts_count=42)
+        response = Client().get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'Всего постов: 42')
+
+    def test_reconcile_command(self):
+        """Команда исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=self.author, group=self.group)
+            for i in range(2)
+        )
+        out = StringIO()
+        call_command('reconcile_counters', stdout=out)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 2)
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.assertIn('Group.posts_count: исправлено 1', out.getvalue())
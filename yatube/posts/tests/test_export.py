@@ -0,0 +1,79 @@
+import csv
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='exported', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост, с запятой', author=cls.author, group=cls.group
+        )
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def test_command_jsonl(self):
+        """Команда выгружает все записи в формате импорта."""
+        stdout = StringIO()
+        call_command('export_posts', stdout=stdout)
+        records = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        self.assertEqual(records, [
+            {
+                'type': 'post', 'id': self.post.pk, 'author': 'writer',
+                'text': 'Пост, с запятой', 'group': 'exported',
+                'created': self.post.created.isoformat(),
+            },
+            {
+                'type': 'comment', 'id': self.comment.pk,
+                'post': self.post.pk, 'author': 'reader',
+                'text': 'Комментарий',
+                'created': self.comment.created.isoformat(),
+            },
+            {'type': 'follow', 'user': 'reader', 'author': 'writer'},
+        ])
+
+    def test_command_csv_for_user(self):
+        """С --user выгружаются только данные пользователя."""
+        stdout = StringIO()
+        call_command(
+            'export_posts', '--format', 'csv', '--user', 'writer',
+            stdout=stdout
+        )
+        rows = list(csv.DictReader(StringIO(stdout.getvalue())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['text'], 'Пост, с запятой')
+        self.assertEqual(rows[0]['type'], 'post')
+
+    def test_endpoint_streams_own_data(self):
+        """Выгрузка на сайте потоковая, только для вошедшего и его данных."""
+        url = reverse('posts:export')
+        response = Client().get(url)
+        self.assertEqual(response.status_code, 302)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(
+            response['Content-Disposition'],
+            'attachment; filename="reader.jsonl"'
+        )
+        types = [
+            json.loads(line)['type']
+            for line in b''.join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(types, ['comment', 'follow'])
+        self.assertEqual(client.get(url, {'format': 'xml'}).status_code, 404)
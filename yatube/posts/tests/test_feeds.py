@@ -0,0 +1,72 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post, User
+
+
+class FeedsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='feeds', description='Описание группы'
+        )
+        cls.post = Post.objects.create(
+            text='Пост для ленты', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds_list_posts(self):
+        """RSS и Atom есть для главной, группы и автора."""
+        urls = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=['feeds']): 'application/rss+xml',
+            reverse('posts:group_atom', args=['feeds']):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=['writer']):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=['writer']):
+                'application/atom+xml',
+        }
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                self.assertContains(response, 'Пост для ленты')
+                self.assertContains(
+                    response,
+                    reverse('posts:post_detail', args=[self.post.pk])
+                )
+        self.assertEqual(
+            self.client.get(
+                reverse('posts:group_rss', args=['missing'])
+            ).status_code,
+            404
+        )
+
+    def test_unchanged_feed_not_modified(self):
+        """Неизменная лента отвечает 304 без запросов в базу."""
+        url = reverse('posts:group_rss', args=['feeds'])
+        response = self.client.get(url)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # Одна дата не видит правок и удалений: без ETag лента отдаётся
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 200)
+        self.post.text = 'Правка'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Правка')
@@ -0,0 +1,356 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from unittest import mock
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .. import media, resize, thumbnails
+from ..forms import PostForm
+from ..models import MediaFile, Post, User
+from ..storage import is_hashed_name, post_image_storage
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='image.png', size=(120, 80), color=(200, 30, 30),
+               format_='PNG', **params):
+    file_obj = BytesIO()
+    Image.new('RGB', size, color).save(file_obj, format_, **params)
+    return SimpleUploadedFile(
+        name, file_obj.getvalue(), content_type=f'image/{format_.lower()}'
+    )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='painter')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_schedule_generates_thumbnails(self):
+        """Все варианты картинки создаются заранее."""
+        post = Post.objects.create(
+            text='С картинкой', author=self.user,
+            image=make_image(color=(10, 200, 10))
+        )
+        key = ImageFile(post.image).key
+        self.assertIsNone(default.kvstore._get(key, identity='thumbnails'))
+        thumbnails.schedule(post.image.name)
+        self.assertEqual(
+            len(default.kvstore._get(key, identity='thumbnails')),
+            len(thumbnails.variants())
+        )
+
+    def test_prefetch_resolves_page_in_one_lookup(self):
+        """Миниатюры страницы находятся без запросов к базе."""
+        posts = [
+            Post.objects.create(
+                text=f'Пост {i}', author=self.user,
+                image=make_image(f'feed{i}.png')
+            )
+            for i in range(3)
+        ]
+        for post in posts:
+            thumbnails.schedule(post.image.name)
+        _, _, geometry, options = thumbnails.fallback_variant()
+        expected = [
+            get_thumbnail(post.image, geometry, **options).url
+            for post in posts
+        ]
+        with self.assertNumQueries(0):
+            thumbnails.prefetch(posts)
+        self.assertEqual([post.thumbnail.url for post in posts], expected)
+        for post in posts:
+            self.assertEqual(
+                len(post.thumbnail_srcset.split(', ')),
+                len(settings.POST_IMAGE_WIDTHS)
+            )
+
+    def test_prefetch_miss_does_not_render(self):
+        """Промах по кэшу: исходная картинка, миниатюры уходят в пул."""
+        post = Post.objects.create(
+            text='Без миниатюр', author=self.user,
+            image=make_image('cold.png', color=(1, 2, 3))
+        )
+        with mock.patch.object(thumbnails, 'schedule') as schedule, \
+                mock.patch.object(thumbnails, 'get_thumbnail') as render:
+            thumbnails.prefetch([post])
+        render.assert_not_called()
+        schedule.assert_called_once_with(post.image.name)
+        self.assertTrue(post.thumbnail_pending)
+        self.assertEqual(post.thumbnail.url, post.image.url)
+
+    def test_placeholder_computed_at_upload(self):
+        """Заглушка считается при загрузке и выводится в style картинки."""
+        post = Post.objects.create(
+            text='С картинкой', author=self.user,
+            image=make_image(color=(255, 0, 0))
+        )
+        self.assertEqual(
+            post.image_placeholder,
+            ' '.join(['ff0000'] * settings.POST_PLACEHOLDER_COLORS)
+        )
+        response = self.client.get(f'/posts/{post.pk}/')
+        self.assertContains(response, 'linear-gradient(90deg, #ff0000')
+
+    @override_settings(POST_IMAGE_FORMATS=('WEBP', 'NO-SUCH-FORMAT'))
+    def test_variants_skip_unsupported_formats(self):
+        """Форматы, которые Pillow не сохраняет, не попадают в варианты."""
+        formats = {format_ for format_, *_ in thumbnails.variants()}
+        self.assertNotIn('NO-SUCH-FORMAT', formats)
+        self.assertIn(thumbnails.FALLBACK_FORMAT, formats)
+        self.assertEqual(
+            len(thumbnails.variants()),
+            len(formats) * len(settings.POST_IMAGE_WIDTHS)
+        )
+
+    def test_post_page_renders_picture(self):
+        """Страница поста отдаёт <picture> с srcset и размерами."""
+        post = Post.objects.create(
+            text='С картинкой', author=self.user, image=make_image()
+        )
+        thumbnails.schedule(post.image.name)
+        response = self.client.get(f'/posts/{post.pk}/')
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'width="960" height="339"')
+
+
+@override_settings(POST_UPLOAD_MAX_SIZE=(100, 100))
+class UploadsTest(TestCase):
+    def clean(self, image):
+        form = PostForm(data={'text': 'Картинка'}, files={'image': image})
+        form.is_valid()
+        return form
+
+    def test_upload_is_bounded_and_reencoded(self):
+        """Большая картинка уменьшается и пересжимается в JPEG."""
+        form = self.clean(make_image('big.png', size=(400, 200)))
+        image = form.cleaned_data['image']
+        self.assertEqual(image.name, 'big.jpg')
+        with Image.open(image) as stored:
+            self.assertEqual(stored.format, 'JPEG')
+            self.assertEqual(stored.size, (100, 50))
+
+    def test_upload_is_rotated_and_stripped(self):
+        """Поворот из EXIF применяется, метаданные не сохраняются."""
+        exif = Image.Exif()
+        # Orientation = 6: повернуть на 90° по часовой стрелке
+        exif[0x0112] = 6
+        form = self.clean(make_image(
+            'photo.jpg', size=(80, 40), format_='JPEG', exif=exif
+        ))
+        with Image.open(form.cleaned_data['image']) as stored:
+            self.assertEqual(stored.size, (40, 80))
+            self.assertNotIn('exif', stored.info)
+
+    @override_settings(POST_UPLOAD_MAX_PIXELS=100)
+    def test_decompression_bomb_is_rejected(self):
+        """Картинка с огромным числом пикселей отклоняется."""
+        form = self.clean(make_image(size=(20, 20)))
+        self.assertIn('image', form.errors)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='collector')
+
+    def create_post(self, image):
+        return Post.objects.create(
+            text='С картинкой', author=self.user, image=image
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Одинаковые картинки хранятся одним файлом с двумя ссылками."""
+        first = self.create_post(make_image('one.png', color=(1, 2, 3)))
+        second = self.create_post(make_image('two.png', color=(1, 2, 3)))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(is_hashed_name(first.image.name))
+        self.assertEqual(
+            MediaFile.objects.get(name=first.image.name).references, 2
+        )
+
+    def test_file_deleted_with_last_reference(self):
+        """Файл удаляется, только когда на него не ссылается ни один пост."""
+        first = self.create_post(make_image(color=(4, 5, 6)))
+        second = self.create_post(make_image(color=(4, 5, 6)))
+        name = first.image.name
+        first.delete()
+        media.delete_unreferenced(name)
+        self.assertTrue(post_image_storage.exists(name))
+        second.delete()
+        media.delete_unreferenced(name)
+        self.assertFalse(post_image_storage.exists(name))
+        self.assertFalse(MediaFile.objects.filter(name=name).exists())
+
+    def test_migrate_media_moves_legacy_files(self):
+        """migrate_media переносит старые файлы и считает ссылки."""
+        legacy = post_image_storage._save(
+            'posts/legacy.png',
+            ContentFile(make_image(color=(7, 8, 9)).read())
+        )
+        post = self.create_post('')
+        Post.objects.filter(pk=post.pk).update(image=legacy)
+        call_command('migrate_media', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(is_hashed_name(post.image.name))
+        self.assertTrue(post_image_storage.exists(post.image.name))
+        self.assertFalse(post_image_storage.exists(legacy))
+        self.assertEqual(
+            MediaFile.objects.get(name=post.image.name).references, 1
+        )
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT,
+    RESIZE_CACHE_DIR=os.path.join(TEMP_MEDIA_ROOT, 'resize')
+)
+class ResizeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='resizer')
+        cls.post = Post.objects.create(
+            text='С картинкой', author=cls.user,
+            image=make_image(size=(300, 200), color=(90, 60, 30))
+        )
+
+    def setUp(self):
+        shutil.rmtree(settings.RESIZE_CACHE_DIR, ignore_errors=True)
+        resize.cache_size = None
+
+    def test_signed_url_serves_resized_image(self):
+        """По подписанной ссылке отдаётся картинка нужного размера."""
+        url = resize.resize_url(self.post.image.name, 60, 60, crop=True)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as im:
+            self.assertEqual(im.size, (60, 60))
+        self.assertTrue(
+            os.path.exists(resize.cache_path('60x60c', self.post.image.name))
+        )
+
+    def test_bad_signature_and_spec(self):
+        """Без подписи и со слишком большим размером - 404."""
+        url = resize.resize_url(self.post.image.name, 60, 60)
+        self.assertEqual(
+            self.client.get(url.replace('60x60', '61x60')).status_code, 404
+        )
+        huge = resize.resize_url(self.post.image.name, 9999, 9999)
+        self.assertEqual(self.client.get(huge).status_code, 404)
+
+    def test_concurrent_requests_render_once(self):
+        """Одновременные запросы одного варианта ждут один рендер."""
+        render = resize.render
+        calls = []
+
+        def slow_render(*args):
+            calls.append(args)
+            time.sleep(0.2)
+            return render(*args)
+
+        results = []
+        with mock.patch.object(resize, 'render', slow_render):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    resize.get_resized('40x30', self.post.image.name)
+                ))
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(set(results)), 1)
+
+    @override_settings(RESIZE_CACHE_MAX_BYTES=1)
+    def test_cache_evicts_over_budget(self):
+        """Кэш, вышедший за бюджет, вычищается."""
+        path = resize.get_resized('40x30', self.post.image.name)
+        self.assertFalse(os.path.exists(path))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='viewer')
+        cls.post = Post.objects.create(
+            text='С картинкой', author=cls.user,
+            image=make_image(color=(33, 66, 99))
+        )
+        cls.url = cls.post.image.url
+        cls.size = cls.post.image.size
+
+    def test_full_file_and_conditional_get(self):
+        """Файл отдаётся целиком, повторный запрос получает 304."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), self.size)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_request(self):
+        """Range отдаёт только запрошенные байты."""
+        response = self.client.get(self.url, HTTP_RANGE='bytes=1-10')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(
+            response['Content-Range'], f'bytes 1-10/{self.size}'
+        )
+        body = b''.join(response.streaming_content)
+        with self.post.image.open('rb') as file:
+            self.assertEqual(body, file.read()[1:11])
+        response = self.client.get(
+            self.url, HTTP_RANGE=f'bytes={self.size}-'
+        )
+        self.assertEqual(response.status_code, 416)
+
+    @override_settings(SENDFILE_BACKEND='nginx')
+    def test_nginx_accel_redirect(self):
+        """С nginx байты отдаёт фронтовой сервер."""
+        response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'],
+            settings.MEDIA_INTERNAL_URL + self.post.image.name
+        )
+        self.assertEqual(response.content, b'')
+
+    def test_private_and_unsafe_paths(self):
+        """Закрытые каталоги и выход за MEDIA_ROOT - 404."""
+        private = os.path.join(settings.MEDIA_ROOT, 'private.txt')
+        with open(private, 'w') as file:
+            file.write('только для персонала')
+        self.addCleanup(os.remove, private)
+        paths = (
+            '/media/exports/data.json', '/media/../manage.py',
+            '/media/private.txt', '/media/posts/../private.txt',
+            '/media/posts/%2e%2e/private.txt', '/media/cache/./../private.txt',
+        )
+        for path in paths:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
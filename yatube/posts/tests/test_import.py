@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, Timeline, User, UserStats
+from ..search import filter_matching
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='imported', description='Описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def import_lines(self, records, *args):
+        lines = '\n'.join(
+            record if isinstance(record, str) else json.dumps(record)
+            for record in records
+        )
+        stdout, stderr = StringIO(), StringIO()
+        with mock.patch('sys.stdin', StringIO(lines)):
+            call_command(
+                'import_posts', '-', *args, stdout=stdout, stderr=stderr
+            )
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_jsonl(self):
+        """Посты и комментарии импортируются, плохие строки пропускаются."""
+        stdout, stderr = self.import_lines([
+            {
+                'id': 500, 'author': 'writer', 'text': 'Первый',
+                'group': 'imported', 'created': '2020-01-02T03:04:05Z',
+            },
+            {'author': 'writer', 'text': 'Второй'},
+            {'type': 'comment', 'post': 500, 'author': 'reader',
+             'text': 'Комментарий'},
+            {'type': 'comment', 'post': 999, 'author': 'reader',
+             'text': 'Без поста'},
+            {'author': 'nobody', 'text': 'Чужой'},
+            {'author': 'writer', 'text': ''},
+            'не json',
+        ], '--batch-size', '2', '--batches-per-transaction', '1')
+        self.assertIn('постов: 2, комментариев: 1, пропущено строк: 4', stdout)
+        for line in (4, 5, 6, 7):
+            self.assertIn(f'Строка {line}:', stderr)
+        post = Post.objects.get(pk=500)
+        self.assertEqual(
+            post.created, datetime(2020, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        )
+        self.assertEqual(post.group, self.group)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(Comment.objects.filter(post=post).exists())
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.posts_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 2
+        )
+        self.assertEqual(
+            Timeline.objects.filter(follower=self.reader).count(), 2
+        )
+        # Последовательность ключей сдвинута за явно заданный id
+        self.assertGreater(
+            Post.objects.create(text='Новый', author=self.author).pk, 500
+        )
+
+    def test_import_csv_creates_users(self):
+        """
+        CSV определяется по расширению, новые авторы создаются,
+        с отложенной индексацией посты находятся поиском.
+        """
+        with tempfile.NamedTemporaryFile(
+            'w', suffix='.csv', delete=False, encoding='utf-8'
+        ) as file:
+            file.write('author,text,group\nnewcomer,"Текст, с запятой",\n')
+        self.addCleanup(os.remove, file.name)
+        call_command(
+            'import_posts', file.name, '--create-users',
+            '--defer-search-index', stdout=StringIO()
+        )
+        post = Post.objects.get(author__username='newcomer')
+        self.assertEqual(post.text, 'Текст, с запятой')
+        self.assertIsNone(post.group)
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(
+            list(filter_matching(Post.objects.all(), 'запятой')), [post]
+        )
+        Post.objects.create(text='После импорта', author=post.author)
+        self.assertEqual(
+            filter_matching(Post.objects.all(), 'импорта').count(), 1
+        )
+
+    def test_failed_transaction_keeps_search_trigger(self):
+        """
+        Сбой импорта с отложенной индексацией откатывает свою
+        транзакцию, а посты сайта после него индексируются как обычно.
+        """
+        deleted = Post.objects.create(text='Удалённый', author=self.author)
+        existing = Post.objects.create(text='Старый', author=self.author)
+        deleted.delete()
+        with self.assertRaises(CommandError):
+            self.import_lines([
+                {'id': deleted.pk, 'author': 'writer',
+                 'text': 'Вставлен ниже'},
+                {'author': 'writer', 'text': 'Первая транзакция'},
+                {'author': 'writer', 'text': 'Вторая транзакция'},
+                {'id': existing.pk, 'author': 'writer', 'text': 'Дубль'},
+            ], '--batch-size', '2', '--batches-per-transaction', '1',
+                '--defer-search-index')
+        for word, found in (('ниже', 1), ('Первая', 1), ('Вторая', 0)):
+            with self.subTest(word=word):
+                self.assertEqual(
+                    filter_matching(Post.objects.all(), word).count(), found
+                )
+        Post.objects.create(text='После сбоя', author=self.author)
+        self.assertEqual(
+            filter_matching(Post.objects.all(), 'сбоя').count(), 1
+        )
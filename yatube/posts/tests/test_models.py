@@ -1,7 +1,10 @@
+from unittest import skipUnless
+
 from django.conf import settings
+from django.db import IntegrityError, connection, transaction
 from django.test import TestCase
 
-from ..models import Group, Post, User
+from ..models import Comment, Follow, Group, Post, Timeline, User
 
 
 class PostModelTest(TestCase):
@@ -59,3 +62,56 @@ class PostModelTest(TestCase):
                 self.assertEqual(
                     str(field), expected_value
                 )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN из SQLite')
+class QueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='plan')
+        cls.author = User.objects.create_user(username='plan_author')
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(row[-1] for row in cursor.fetchall())
+
+    def test_feeds_use_indexes(self):
+        """Ленты читаются по составным индексам без сортировки."""
+        ordering = ('-created', '-id')
+        feeds = {
+            'post_created': Post.objects.order_by(*ordering),
+            'post_author_created': Post.objects.filter(
+                author=self.user
+            ).order_by(*ordering),
+            'post_group_created': Post.objects.filter(
+                group_id=1
+            ).order_by(*ordering),
+            'comment_post_created': Comment.objects.filter(
+                post_id=1
+            ).order_by(*ordering),
+            'timeline_follower_created': Timeline.objects.filter(
+                follower=self.user
+            ).order_by('-created', '-post_id'),
+        }
+        for index, queryset in feeds.items():
+            with self.subTest(index=index):
+                plan = self.plan(queryset[:settings.NUM_POSTS + 1])
+                self.assertIn(index, plan)
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_follow_lookup_uses_unique_index(self):
+        """Проверка подписки идёт по уникальному индексу (user, author)."""
+        plan = self.plan(
+            Follow.objects.filter(user=self.user, author=self.author)
+        )
+        self.assertIn('INDEX', plan)
+        self.assertIn('user_id=? AND author_id=?', plan)
+
+    def test_follow_is_unique(self):
+        """Повторная подписка на того же автора запрещена."""
+        Follow.objects.create(user=self.user, author=self.author)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=self.user, author=self.author)
@@ -0,0 +1,94 @@
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import (
+    SearchPaginator, deferred_index, filter_matching, match_expression
+)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.admin = User.objects.create_superuser(
+            username='boss', email='boss@example.com', password='pass'
+        )
+        cls.best = Post.objects.create(
+            author=cls.user, text='Котики котики котики <b>везде</b>'
+        )
+        cls.other = Post.objects.create(
+            author=cls.user, text='Один котик среди длинного текста про собак'
+        )
+        cls.miss = Post.objects.create(author=cls.user, text='Только собаки')
+
+    def test_match_expression_quotes_words(self):
+        """Операторы FTS5 экранируются, последнее слово ищется как префикс."""
+        self.assertEqual(match_expression('кот OR "x'), '"кот" "OR" "x"*')
+        self.assertEqual(match_expression(' ?! '), '')
+
+    def test_ranked_highlighted_results(self):
+        """Результаты по рангу, совпадения подсвечены, HTML экранирован."""
+        response = self.client.get(reverse('posts:search'), {'q': 'котики'})
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.best])
+        self.assertIn('<mark>Котики</mark>', posts[0].snippet)
+        self.assertIn('&lt;b&gt;', posts[0].snippet)
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertEqual(
+            list(response.context['page_obj']), [self.best, self.other]
+        )
+
+    @override_settings(FEED_COUNT_LIMIT=3)
+    def test_count_over_limit_is_estimate(self):
+        """Совпадений больше FEED_COUNT_LIMIT: выводится оценка снизу."""
+        for number in range(3):
+            Post.objects.create(author=self.user, text=f'Кот номер {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'кот'})
+        self.assertContains(response, 'Найдено записей: больше 3')
+
+    def test_interrupted_deferral_rolls_back(self):
+        """
+        Если импорт оборвался внутри deferred_index, метка откатывается
+        с транзакцией и триггер снова индексирует новые посты.
+        """
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            # Выход из блока не выполняется, как у убитого процесса
+            deferred_index([]).__enter__()
+            Post.objects.create(author=self.user, text='Прерванный импорт')
+            raise RuntimeError
+        Post.objects.create(author=self.user, text='Пост после импорта')
+        self.assertEqual(
+            filter_matching(Post.objects.all(), 'импорта').count(), 1
+        )
+
+    def test_cursor_pagination(self):
+        """Курсор ведёт на следующую страницу результатов и обратно."""
+        paginator = SearchPaginator(Post.objects.all(), 1, query='кот')
+        first = paginator.get_page(None)
+        second = paginator.get_page(first.next_cursor)
+        self.assertEqual(list(first), [self.best])
+        self.assertEqual(list(second), [self.other])
+        self.assertIsNone(second.next_cursor)
+        back = paginator.get_page(second.previous_cursor)
+        self.assertEqual(list(back), [self.best])
+
+    def test_index_follows_edits(self):
+        """Индекс обновляется вместе с текстом поста."""
+        Post.objects.filter(pk=self.miss.pk).update(text='Теперь про котов')
+        paginator = SearchPaginator(Post.objects.all(), 10, query='котов')
+        self.assertEqual(list(paginator.get_page(None)), [self.miss])
+        Post.objects.filter(pk=self.miss.pk).delete()
+        self.assertEqual(list(paginator.get_page(None)), [])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через полнотекстовый индекс."""
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list), {self.other, self.miss}
+        )
@@ -0,0 +1,114 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, Timeline, User
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(text='Старый', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def timeline_posts(self):
+        return [entry.post for entry in self.reader.timeline.all()]
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка переносит посты автора в ленту, отписка убирает."""
+        self.client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+        self.client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertEqual(self.timeline_posts(), [])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленты подписчиков."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(text='Новый', author=self.author)
+        self.assertEqual(self.timeline_posts(), [post, self.old_post])
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            list(response.context['page_obj']), [post, self.old_post]
+        )
+
+    def test_rebuild_command(self):
+        """Команда пересобирает ленты по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Timeline.objects.all().delete()
+        stale = User.objects.create_user(username='stale')
+        Timeline.objects.create(
+            follower=stale, post=self.old_post, created=self.old_post.created
+        )
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.timeline_posts(), [self.old_post])
+        self.assertFalse(stale.timeline.exists())
+
+
+@override_settings(TIMELINE_FANOUT_THRESHOLD=1, TIMELINE_PUSHBACK_THRESHOLD=0)
+class HybridTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def test_popular_author_is_pulled(self):
+        """Посты популярного автора не раскладываются, но есть в ленте."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=author)
+            for i, author in enumerate(
+                [self.star, self.author] * 6
+            )
+        ]
+        self.assertFalse(
+            Timeline.objects.filter(post__author=self.star).exists()
+        )
+        response = self.client.get(reverse('posts:follow_index'))
+        page_obj = response.context['page_obj']
+        self.assertEqual(list(page_obj), posts[::-1][:10])
+        response = self.client.get(
+            reverse('posts:follow_index'), {'cursor': page_obj.next_cursor}
+        )
+        self.assertEqual(list(response.context['page_obj']), posts[1::-1])
+
+    def test_unfollow_keeps_author_pulled(self):
+        """Отписка не возвращает автора в раскладку до rebuild_timelines."""
+        Follow.objects.create(user=self.reader, author=self.star)
+        Follow.objects.create(user=self.fan, author=self.star)
+        post = Post.objects.create(text='Пост', author=self.star)
+        Follow.objects.filter(user=self.fan).delete()
+        self.assertFalse(self.reader.timeline.exists())
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(list(response.context['page_obj']), [post])
+        with override_settings(TIMELINE_PUSHBACK_THRESHOLD=1):
+            call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(
+            [entry.post for entry in self.reader.timeline.all()], [post]
+        )
+        Post.objects.create(text='Новый пост', author=self.star)
+        self.assertEqual(self.reader.timeline.count(), 2)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 2)
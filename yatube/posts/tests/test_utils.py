@@ -0,0 +1,96 @@
+from base64 import urlsafe_b64encode
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..checks import check_shared_cache
+from ..models import Group, Post, User
+from ..utils import CachedCountPaginator, decode_cursor, feed_count_key
+
+
+class CachedCountPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='counter')
+        cls.group = Group.objects.create(
+            title='Группа', slug='count_slug', description='Описание'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Пост {i}', author=cls.user, group=cls.group)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def paginator(self):
+        return CachedCountPaginator(
+            Post.objects.all(), 10, count_key=feed_count_key('index')
+        )
+
+    def test_count_cached(self):
+        """Тёплый счётчик не ходит в базу."""
+        self.assertEqual(self.paginator().count, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.paginator().count, 3)
+
+    def test_count_follows_posts(self):
+        """Счётчик меняется при создании и удалении поста."""
+        self.assertEqual(self.paginator().count, 3)
+        post = Post.objects.create(
+            text='Новый', author=self.user, group=self.group
+        )
+        self.assertEqual(self.paginator().count, 4)
+        post.delete()
+        Post.objects.first().delete()
+        self.assertEqual(self.paginator().count, 2)
+
+    @override_settings(FEED_COUNT_LIMIT=2)
+    def test_count_estimate(self):
+        """Большая лента отдаёт оценку и не кладёт её в кэш."""
+        paginator = self.paginator()
+        self.assertEqual(paginator.count, 2)
+        self.assertTrue(paginator.count_is_estimate)
+        self.assertIsNone(cache.get(feed_count_key('index')))
+
+
+def token(raw):
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+class DecodeCursorTest(SimpleTestCase):
+    def test_valid_cursor(self):
+        direction, (created, pk) = decode_cursor(
+            token('n|2020-01-01T03:00:00+03:00|5')
+        )
+        self.assertEqual((direction, pk), ('n', 5))
+        self.assertEqual(created.isoformat(), '2020-01-01T00:00:00+00:00')
+
+    def test_impossible_cursors_ignored(self):
+        """Курсоры, на которых упала бы база, считаются отсутствующими."""
+        cursors = {
+            'огромный id': 'n|2020-01-01T00:00:00+00:00|' + '9' * 23,
+            'нулевой id': 'n|2020-01-01T00:00:00+00:00|0',
+            'дата вне диапазона': 'n|0001-01-01T00:00:00+05:00|1',
+            'дата без пояса': 'n|2020-01-01T00:00:00|1',
+            'бесконечный ранг': 'n|inf|1',
+            'не число': 'n|nan|1',
+        }
+        for case, raw in cursors.items():
+            with self.subTest(case=case):
+                self.assertIsNone(decode_cursor(token(raw)))
+
+
+class SharedCacheCheckTest(TestCase):
+    def test_process_local_cache_fails_deploy_check(self):
+        """check --deploy требует кэш, общий для процессов сервера."""
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ['posts.E001']
+        )
+        memcached = {'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': '127.0.0.1:11211',
+        }}
+        with override_settings(CACHES=memcached):
+            self.assertEqual(check_shared_cache(None), [])
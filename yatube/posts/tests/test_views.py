@@ -1,5 +1,6 @@
 import shutil
 import tempfile
+from base64 import urlsafe_b64encode
 
 from django import forms
 from django.test import TestCase, Client, override_settings
@@ -14,7 +15,7 @@ from ..models import Group, Post, User, Comment, Follow
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
 class PostPagesTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -192,14 +193,40 @@ class PostPagesTest(TestCase):
         )
         post_list = [post for _ in range(amount_of_post)]
         Post.objects.bulk_create(post_list)
-        page_posts_amount = [(1, 10), (2, 3)]
-        for page_pag, posts in page_posts_amount:
-            for page in pages_with_paginator:
-                with self.subTest(page=page):
-                    response = self.authorized_client.get(
-                        page, {'page': page_pag}
-                    )
-                    self.assertEqual(len(response.context['page_obj']), posts)
+        for page in pages_with_paginator:
+            with self.subTest(page=page):
+                first = self.authorized_client.get(page).context['page_obj']
+                self.assertEqual(len(first), 10)
+                self.assertIsNone(first.previous_cursor)
+                second = self.authorized_client.get(
+                    page, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second), 3)
+                self.assertIsNone(second.next_cursor)
+                back = self.authorized_client.get(
+                    page, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), list(first))
+
+    def test_paginator_bad_cursor(self):
+        """Битый курсор открывает первую страницу."""
+        response = self.authorized_client.get(
+            PostPagesTest.templates_pages_names['profile']['url'],
+            {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(
+            list(response.context['page_obj']), [PostPagesTest.post]
+        )
+        huge_id = urlsafe_b64encode(
+            b'n|2020-01-01T00:00:00+00:00|99999999999999999999999'
+        ).decode()
+        for name in ('index', 'group_list', 'profile', 'post_detail'):
+            with self.subTest(page=name):
+                response = self.authorized_client.get(
+                    PostPagesTest.templates_pages_names[name]['url'],
+                    {'cursor': huge_id}
+                )
+                self.assertEqual(response.status_code, 200)
 
     def test_authorized_add_comment(self):
         """Авторизованный может создавать комменты."""
@@ -236,6 +263,33 @@ class PostPagesTest(TestCase):
             PostPagesTest.post.comments.first().post
         )
 
+    @override_settings(NUM_COMMENTS=2)
+    def test_comments_paginated(self):
+        """Комментарии выводятся страницами, следующие отдаёт endpoint."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Коммент {i}')
+            for i in range(2)
+        )
+        response = self.authorized_client.get(
+            PostPagesTest.templates_pages_names['post_detail']['url']
+        )
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 2)
+        url = reverse('posts:post_comments', args=[self.post.pk])
+        fragment = self.guest_client.get(
+            url, {'cursor': comments.next_cursor}
+        )
+        self.assertContains(fragment, PostPagesTest.comments.text)
+        self.assertIsNone(fragment.context['comments'].next_cursor)
+        data = self.guest_client.get(
+            url, {'cursor': comments.next_cursor, 'format': 'json'}
+        ).json()
+        self.assertEqual(
+            [comment['id'] for comment in data['comments']],
+            [PostPagesTest.comments.pk]
+        )
+        self.assertIsNone(data['next'])
+
     def test_guest_not_add_comment(self):
         """
         Проверка наличия комментария с
@@ -259,21 +313,61 @@ class PostPagesTest(TestCase):
 
     def test_cache_index(self):
         """Тест кэширования страницы index."""
-        first_state = self.authorized_client.get(
-            PostPagesTest.templates_pages_names['index']['url']
+        url = PostPagesTest.templates_pages_names['index']['url']
+        first_state = self.authorized_client.get(url)
+        Post.objects.filter(pk=PostPagesTest.post.pk).update(
+            text='Изменено в обход сигналов'
         )
+        second_state = self.authorized_client.get(url)
+        self.assertEqual(first_state.content, second_state.content)
         post_1 = Post.objects.get(pk=PostPagesTest.post.id)
         post_1.text = 'Измененный текст'
         post_1.save()
-        second_state = self.authorized_client.get(
-            PostPagesTest.templates_pages_names['index']['url']
-        )
-        self.assertEqual(first_state.content, second_state.content)
-        cache.clear()
-        third_state = self.authorized_client.get(
-            PostPagesTest.templates_pages_names['index']['url']
-        )
+        third_state = self.authorized_client.get(url)
         self.assertNotEqual(first_state.content, third_state.content)
+        self.assertContains(third_state, 'Измененный текст')
+
+    def test_cache_pages_differ(self):
+        """Каждая страница ленты кэшируется под своим ключом."""
+        Post.objects.bulk_create(
+            Post(author=PostPagesTest.user, text=f'Пост номер {i}')
+            for i in range(settings.NUM_POSTS)
+        )
+        for name in ('index', 'profile'):
+            with self.subTest(page=name):
+                url = PostPagesTest.templates_pages_names[name]['url']
+                first = self.guest_client.get(url)
+                second = self.guest_client.get(
+                    url, {'cursor': first.context['page_obj'].next_cursor}
+                )
+                self.assertContains(second, PostPagesTest.post.text)
+                self.assertNotContains(first, PostPagesTest.post.text)
+
+    def test_anonymous_response_cache(self):
+        """Аноним получает страницу из кэша, запись в базу её обновляет."""
+        for name in ('index', 'group_list', 'profile', 'post_detail'):
+            with self.subTest(page=name):
+                url = PostPagesTest.templates_pages_names[name]['url']
+                first = self.guest_client.get(url)
+                with self.assertNumQueries(0):
+                    second = self.guest_client.get(url)
+                    # Параметры, которые страница не читает, не меняют ключ
+                    third = self.guest_client.get(url, {'utm': name})
+                self.assertEqual(first.content, second.content)
+                self.assertEqual(first.content, third.content)
+                post = Post.objects.get(pk=PostPagesTest.post.pk)
+                post.text = f'Новый текст для {name}'
+                post.save()
+                self.assertContains(
+                    self.guest_client.get(url), post.text
+                )
+
+    def test_authorized_not_cached(self):
+        """Авторизованному пользователю страница всегда рендерится."""
+        url = PostPagesTest.templates_pages_names['index']['url']
+        self.authorized_client.get(url)
+        response = self.authorized_client.get(url)
+        self.assertIsNotNone(response.context)
 
     def test_subscription_feed(self):
         """Запись появляется в ленте подписчика."""
@@ -347,3 +441,89 @@ class PostPagesTest(TestCase):
             amount_follower + 1,
             Follow.objects.filter(author=PostPagesTest.user).count()
         )
+
+    def test_repeated_follow_and_missing_author(self):
+        """Повторная подписка не дублируется, неизвестный автор - 404."""
+        url = reverse('posts:profile_follow', args=[PostPagesTest.user])
+        for _ in range(2):
+            response = self.client_auth_follower.get(url)
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            Follow.objects.filter(
+                user=PostPagesTest.user_follower, author=PostPagesTest.user
+            ).count(),
+            1
+        )
+        response = self.client_auth_follower.get(
+            reverse('posts:profile_follow', args=['missing'])
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='conditional', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            text='Пост', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменная страница отвечает 304 без запросов в базу."""
+        urls = (
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=['writer']),
+            reverse('posts:group_list', args=['conditional']),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('Last-Modified', response)
+                with self.assertNumQueries(0):
+                    response = self.client.get(
+                        url, HTTP_IF_NONE_MATCH=response['ETag']
+                    )
+                self.assertEqual(response.status_code, 304)
+
+    def test_comment_and_user_change_validators(self):
+        """Новый комментарий и другой пользователь дают новый ETag."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Да')
+        etag = response['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            304
+        )
+
+    def test_relogin_changes_etag(self):
+        """После повторного входа форма с новым CSRF-токеном не 304."""
+        client = Client()
+        client.force_login(self.reader)
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = client.get(url)['ETag']
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        client.logout()
+        client.force_login(self.reader)
+        self.assertEqual(
+            client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
@@ -0,0 +1,205 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from PIL import Image
+from sorl.thumbnail import base, default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .storage import post_image_storage
+
+logger = logging.getLogger(__name__)
+
+# Формат, который понимает любой браузер: им отдаётся src картинки
+FALLBACK_FORMAT = 'JPEG'
+
+MIME_TYPES = {
+    'AVIF': 'image/avif',
+    'WEBP': 'image/webp',
+    'JPEG': 'image/jpeg',
+}
+
+executor = None
+# Картинки, чьи миниатюры уже ждут в пуле: страницы с промахом по кэшу
+# не ставят их в очередь повторно
+scheduled = set()
+scheduled_lock = threading.Lock()
+
+
+def supported_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        format_ for format_ in settings.POST_IMAGE_FORMATS
+        if format_ in Image.SAVE
+    ]
+
+
+# sorl-thumbnail не знает расширения для AVIF
+if 'AVIF' in supported_formats():
+    base.EXTENSIONS.setdefault('AVIF', 'avif')
+
+
+def variants():
+    """
+    Варианты картинки поста: (формат, ширина, геометрия, опции).
+    Каждая ширина есть в каждом поддерживаемом формате и в JPEG.
+    """
+    size_width, size_height = settings.POST_IMAGE_SIZE
+    result = []
+    for format_ in supported_formats() + [FALLBACK_FORMAT]:
+        for width in settings.POST_IMAGE_WIDTHS:
+            height = round(width * size_height / size_width)
+            result.append((format_, width, f'{width}x{height}', {
+                'crop': 'center',
+                'upscale': True,
+                'format': format_,
+                'quality': settings.POST_IMAGE_QUALITY,
+            }))
+    return result
+
+
+def fallback_variant():
+    width = settings.POST_IMAGE_SIZE[0]
+    for variant in variants():
+        if variant[:2] == (FALLBACK_FORMAT, width):
+            return variant
+
+
+def generate(name):
+    """Создаёт для картинки все варианты из variants()."""
+    source = ImageFile(name, post_image_storage)
+    for _, _, geometry, options in variants():
+        get_thumbnail(source, geometry, **options)
+
+
+def generate_safely(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        with scheduled_lock:
+            scheduled.discard(name)
+        close_old_connections()
+
+
+def get_executor():
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails'
+        )
+    return executor
+
+
+def schedule(name):
+    """
+    Ставит создание миниатюр в фоновый пул потоков, чтобы первая
+    страница с новой картинкой не ждала sorl-thumbnail.
+    При THUMBNAIL_WORKERS = 0 миниатюры создаются сразу.
+    """
+    if settings.THUMBNAIL_WORKERS:
+        with scheduled_lock:
+            if name in scheduled:
+                return
+            scheduled.add(name)
+        get_executor().submit(generate_safely, name)
+    else:
+        generate_safely(name)
+
+
+def thumbnail_file(source, geometry, options):
+    """
+    ImageFile миниатюры без обращения к хранилищу: имя считается так же,
+    как в ThumbnailBackend.get_thumbnail.
+    """
+    backend = default.backend
+    options = dict(options)
+    if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(thumbnail_settings, attr)
+        if value != getattr(default_settings, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return ImageFile(name, default.storage)
+
+
+def srcset(files):
+    return ', '.join(f'{file.url} {width}w' for width, file in files)
+
+
+def attach(post, resolved):
+    """Раскладывает найденные варианты картинки по атрибутам поста."""
+    fallback = fallback_variant()
+    post.thumbnail = resolved[fallback[:2]]
+    post.thumbnail_size = fallback[2].split('x')
+    for format_ in supported_formats() + [FALLBACK_FORMAT]:
+        format_files = [
+            (width, resolved[(format_, width)])
+            for width in settings.POST_IMAGE_WIDTHS
+            if (format_, width) in resolved
+        ]
+        if format_ == FALLBACK_FORMAT:
+            post.thumbnail_srcset = srcset(format_files)
+        elif format_files:
+            post.thumbnail_sources.append({
+                'type': MIME_TYPES[format_],
+                'srcset': srcset(format_files),
+            })
+
+
+def prefetch(posts):
+    """
+    Находит варианты картинок всех постов страницы одним get_many из
+    кэша хранилища sorl-thumbnail и раскладывает их по постам:
+    post.thumbnail - JPEG для src, post.thumbnail_srcset - его ширины,
+    post.thumbnail_sources - <source> для современных форматов.
+    Если JPEG основной ширины нет в кэше, страница не ждёт sorl-thumbnail:
+    выводится исходная картинка (post.thumbnail_pending), а миниатюры
+    ставятся в пул. Остальные варианты без кэша просто не выводятся.
+    """
+    all_variants = variants()
+    fallback = fallback_variant()
+    files = []
+    for post in posts:
+        post.thumbnail = None
+        post.thumbnail_srcset = ''
+        post.thumbnail_sources = []
+        post.thumbnail_pending = False
+        if post.image:
+            source = ImageFile(post.image)
+            files.append((post, [
+                (variant, thumbnail_file(source, *variant[2:]))
+                for variant in all_variants
+            ]))
+    kv_cache = getattr(default.kvstore, 'cache', None)
+    found = {}
+    if kv_cache is not None and files:
+        found = kv_cache.get_many([
+            add_prefix(file.key)
+            for _, post_files in files for _, file in post_files
+        ])
+    for post, post_files in files:
+        resolved = {}
+        for variant, file in post_files:
+            value = found.get(add_prefix(file.key))
+            if isinstance(value, str):
+                resolved[variant[:2]] = deserialize_image_file(value)
+        if fallback[:2] not in resolved:
+            schedule(post.image.name)
+            post.thumbnail = post.image
+            post.thumbnail_size = fallback[2].split('x')
+            post.thumbnail_pending = True
+            continue
+        attach(post, resolved)
+    return posts
@@ -0,0 +1,180 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Follow, Post, Timeline, UserStats
+from .utils import batched
+
+PULLED_AUTHORS_KEY = 'timeline:pulled_authors'
+
+
+def insert_entries(entries):
+    """Пишет записи ленты пачками по TIMELINE_BATCH_SIZE."""
+    for batch in batched(entries, settings.TIMELINE_BATCH_SIZE):
+        Timeline.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def follower_count(author_id):
+    """Число подписчиков автора из его счётчиков."""
+    return UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+
+
+def is_pulled(author_id):
+    """Посты автора читаются при запросе, а не раскладываются по лентам."""
+    return UserStats.objects.filter(
+        user_id=author_id, timeline_pulled=True
+    ).exists()
+
+
+def pulled_author_ids():
+    """Все авторы, чьи посты читаются при запросе."""
+    author_ids = cache.get(PULLED_AUTHORS_KEY)
+    if author_ids is None:
+        author_ids = set(
+            UserStats.objects.filter(
+                timeline_pulled=True
+            ).values_list('user_id', flat=True)
+        )
+        cache.set(PULLED_AUTHORS_KEY, author_ids, None)
+    return author_ids
+
+
+def author_followed(author_id):
+    """
+    Вызывается после новой подписки. Автор, перешедший порог раскладки,
+    начинает читаться при запросе. Его уже разложенные посты остаются
+    в лентах: при чтении повторы отбрасываются.
+    """
+    if follower_count(author_id) <= settings.TIMELINE_FANOUT_THRESHOLD:
+        return
+    if UserStats.objects.filter(
+        user_id=author_id, timeline_pulled=False
+    ).update(timeline_pulled=True):
+        cache.delete(PULLED_AUTHORS_KEY)
+
+
+def push_back():
+    """
+    Возвращает в раскладку авторов, у которых подписчиков стало не больше
+    TIMELINE_PUSHBACK_THRESHOLD: их посты раскладываются по лентам
+    подписчиков. Вызывается командой rebuild_timelines, а не при отписке,
+    чтобы эта работа не шла в запросе пользователя. Вернёт число авторов.
+    """
+    author_ids = list(UserStats.objects.filter(
+        timeline_pulled=True,
+        followers_count__lte=settings.TIMELINE_PUSHBACK_THRESHOLD
+    ).values_list('user_id', flat=True))
+    for author_id in author_ids:
+        with transaction.atomic():
+            UserStats.objects.filter(user_id=author_id).update(
+                timeline_pulled=False
+            )
+            cache.delete(PULLED_AUTHORS_KEY)
+            follower_ids = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user_id', flat=True)
+            for follower_id in follower_ids:
+                backfill(follower_id, author_id)
+    return len(author_ids)
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True).iterator(
+        chunk_size=settings.TIMELINE_BATCH_SIZE
+    )
+    insert_entries(
+        Timeline(follower_id=pk, post_id=post.pk, created=post.created)
+        for pk in follower_ids
+    )
+
+
+def fan_out_rows(posts):
+    """
+    Раскладывает посты, заданные кортежами (pk, author_id, created),
+    по лентам подписчиков их авторов. Для массовой вставки, где
+    сигналы не срабатывают. Посты популярных авторов пропускаются.
+    """
+    pulled = pulled_author_ids()
+    followers = {}
+
+    def entries():
+        for pk, author_id, created in posts:
+            if author_id in pulled:
+                continue
+            if author_id not in followers:
+                followers[author_id] = list(Follow.objects.filter(
+                    author_id=author_id
+                ).values_list('user_id', flat=True))
+            for follower_id in followers[author_id]:
+                yield Timeline(
+                    follower_id=follower_id, post_id=pk, created=created
+                )
+
+    insert_entries(entries())
+
+
+def backfill(follower_id, author_id):
+    """Добавляет в ленту подписчика все посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'created').iterator(
+        chunk_size=settings.TIMELINE_BATCH_SIZE
+    )
+    insert_entries(
+        Timeline(follower_id=follower_id, post_id=pk, created=created)
+        for pk, created in posts
+    )
+
+
+def prune(follower_id, author_id):
+    """Убирает из ленты подписчика посты автора."""
+    Timeline.objects.filter(
+        follower_id=follower_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild(follower_id):
+    """Собирает ленту подписчика заново по его подпискам."""
+    author_ids = Follow.objects.filter(
+        user_id=follower_id
+    ).values_list('author_id', flat=True)
+    with transaction.atomic():
+        Timeline.objects.filter(follower_id=follower_id).delete()
+        for author_id in author_ids:
+            backfill(follower_id, author_id)
+
+
+def timeline_queryset(user):
+    """Лента подписок пользователя: один проход по индексу его записей."""
+    return Timeline.objects.filter(follower=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def pulled_queryset(user):
+    """
+    Посты популярных авторов, на которых подписан пользователь.
+    Вернёт None, если таких подписок нет.
+    """
+    pulled = pulled_author_ids()
+    if not pulled:
+        return None
+    author_ids = [
+        pk for pk in Follow.objects.filter(user=user).values_list(
+            'author_id', flat=True
+        ) if pk in pulled
+    ]
+    if not author_ids:
+        return None
+    return Post.objects.filter(author_id__in=author_ids).select_related(
+        'author', 'group'
+    )
@@ -0,0 +1,87 @@
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def check_upload(upload):
+    """
+    Отсекает слишком большие файлы и «бомбы декомпрессии» до декодирования:
+    Image.open читает только заголовок с размерами.
+    """
+    if upload.size > settings.POST_UPLOAD_MAX_BYTES:
+        raise ValidationError(
+            'Файл слишком большой: не больше %(limit)d МБ.',
+            code='file_too_large',
+            params={'limit': settings.POST_UPLOAD_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    with Image.open(upload) as image:
+        width, height = image.size
+    if width * height > settings.POST_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: %(width)d×%(height)d.',
+            code='image_too_large',
+            params={'width': width, 'height': height},
+        )
+
+
+def normalize(upload):
+    """
+    Приводит загруженную картинку к виду, в котором она хранится:
+    поворачивает по EXIF, уменьшает до POST_UPLOAD_MAX_SIZE и пересжимает
+    без метаданных. Картинки с прозрачностью сохраняются в PNG,
+    остальные - в JPEG с качеством POST_UPLOAD_QUALITY.
+    """
+    check_upload(upload)
+    upload.seek(0)
+    with Image.open(upload) as image:
+        # JPEG сразу декодируется в уменьшенном масштабе
+        image.draft('RGB', settings.POST_UPLOAD_MAX_SIZE)
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.POST_UPLOAD_MAX_SIZE, Image.LANCZOS)
+        output = BytesIO()
+        if has_alpha(image):
+            image.convert('RGBA').save(output, 'PNG', optimize=True)
+            extension, content_type = 'png', 'image/png'
+        else:
+            image.convert('RGB').save(
+                output, 'JPEG', quality=settings.POST_UPLOAD_QUALITY,
+                optimize=True, progressive=True
+            )
+            extension, content_type = 'jpg', 'image/jpeg'
+    return SimpleUploadedFile(
+        f'{Path(upload.name).stem}.{extension}',
+        output.getvalue(),
+        content_type=content_type
+    )
+
+
+def placeholder(file):
+    """
+    Заглушка для картинки: средние цвета POST_PLACEHOLDER_COLORS полос
+    слева направо в кадре ленты, строкой 'rrggbb rrggbb ...'.
+    """
+    columns = settings.POST_PLACEHOLDER_COLORS
+    width, height = settings.POST_IMAGE_SIZE
+    file.seek(0)
+    with Image.open(file) as image:
+        image.draft('RGB', (width // 10, height // 10))
+        # Кадрируем так же, как миниатюры, и усредняем полосы
+        frame = ImageOps.fit(
+            image.convert('RGB'), (width // 10, height // 10), Image.BOX
+        )
+    file.seek(0)
+    strip = frame.resize((columns, 1), Image.BOX)
+    return ' '.join(
+        '%02x%02x%02x' % strip.getpixel((x, 0)) for x in range(columns)
+    )
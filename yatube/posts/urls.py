@@ -1,21 +1,45 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 app_name = 'posts'
 
 urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
+    path('group/<slug:slug>/rss/', views.group_rss, name='group_rss'),
+    path('group/<slug:slug>/atom/', views.group_atom, name='group_atom'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/rss/', views.author_rss, name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        views.author_atom,
+        name='profile_atom'
+    ),
     path('posts/<post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
     path('', views.index, name='index'),
+    path('rss/', views.index_rss, name='index_rss'),
+    path('atom/', views.index_atom, name='index_atom'),
+    path('search/', views.search, name='search'),
+    path('export/', views.export, name='export'),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
+    path(
+        'images/<str:spec>/<str:signature>/<path:name>',
+        views.resized_image,
+        name='resized_image'
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
@@ -27,4 +51,28 @@ urlpatterns = [
         views.profile_unfollow,
         name='profile_unfollow'
     ),
+    path('api/posts/', api.posts, name='api_posts'),
+    path('api/posts/batch/', api.posts_batch, name='api_posts_batch'),
+    path('api/posts/<int:post_id>/', api.post, name='api_post'),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'
+    ),
+    path('api/groups/', api.groups, name='api_groups'),
+    path('api/groups/<slug:slug>/', api.group, name='api_group'),
+    path(
+        'api/groups/<slug:slug>/posts/',
+        api.group_posts,
+        name='api_group_posts'
+    ),
+    path(
+        'api/profiles/<str:username>/', api.profile, name='api_profile'
+    ),
+    path(
+        'api/profiles/<str:username>/posts/',
+        api.profile_posts,
+        name='api_profile_posts'
+    ),
+    path('api/follow/', api.follow, name='api_follow'),
 ]
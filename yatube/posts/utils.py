@@ -1,9 +1,244 @@
-from django.core.paginator import Paginator
+import binascii
+import heapq
+import math
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timezone
+
+from django.core.cache import cache
+from django.core.paginator import Page, Paginator
 from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+# Направления курсора: следующая (более старые посты) и предыдущая страница
+NEXT = 'n'
+PREVIOUS = 'p'
+# Первичные ключи - знаковые 64-битные целые
+MAX_PK = 2 ** 63
+
+
+def encode_cursor(direction, values):
+    """
+    Упаковывает направление и ключ (created, id) в непрозрачный токен.
+    Вместо даты первым в ключе может быть число, например ранг поиска.
+    """
+    key, pk = values
+    key = key.isoformat() if hasattr(key, 'isoformat') else repr(key)
+    raw = f'{direction}|{key}|{pk}'
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Распаковывает токен. Для пустого, битого или невозможного токена
+    вернёт None: id должен помещаться в INTEGER базы, дата - быть с
+    часовым поясом и переводиться в UTC, число - быть конечным.
+    """
+    if not token:
+        return None
+    try:
+        raw = urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, key, pk = raw.split('|')
+        value = parse_datetime(key)
+        if value is None:
+            value = float(key)
+            if not math.isfinite(value):
+                return None
+        elif value.tzinfo is None:
+            return None
+        else:
+            value = value.astimezone(timezone.utc)
+        pk = int(pk)
+    except (ValueError, OverflowError, binascii.Error, UnicodeDecodeError):
+        return None
+    if direction not in (NEXT, PREVIOUS) or not 0 < pk < MAX_PK:
+        return None
+    return direction, (value, pk)
+
+
+def batched(iterable, size):
+    """Разбивает поток на списки по size элементов."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def feed_count_key(feed, pk=None):
+    """Ключ кэша с количеством постов ленты, например index."""
+    if pk is None:
+        return f'feed_count:{feed}'
+    return f'feed_count:{feed}:{pk}'
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, который берёт количество записей ленты из кэша.
+
+    Счётчик в кэше меняют сигналы при создании и удалении постов.
+    Если кэш холодный, записи считаются не дальше FEED_COUNT_LIMIT:
+    меньшее число точное и кладётся в кэш, иначе возвращается оценка
+    снизу и count_is_estimate истинно.
+    """
+    # Без ключа кэша записи считаются точно, если не выставлено False:
+    # тогда тоже не дальше FEED_COUNT_LIMIT, но без кэширования
+    exact_without_key = True
+
+    def __init__(self, object_list, per_page, count_key=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_key = count_key
+
+    @cached_property
+    def count(self):
+        if self.count_key is None and self.exact_without_key:
+            return Paginator.count.func(self)
+        if self.count_key is not None:
+            count = cache.get(self.count_key)
+            if count is not None:
+                return count
+        limit = settings.FEED_COUNT_LIMIT
+        count = min(self.bounded_count(limit), limit)
+        if count >= limit:
+            self._count_is_estimate = True
+        elif self.count_key is not None:
+            cache.set(self.count_key, count, settings.FEED_COUNT_TIMEOUT)
+        return count
+
+    @property
+    def count_is_estimate(self):
+        # Шаблон может спросить об оценке раньше, чем выведет count
+        self.count
+        return getattr(self, '_count_is_estimate', False)
+
+    def bounded_count(self, limit):
+        return self.object_list.order_by()[:limit].count()
+
+
+class CursorPaginator(CachedCountPaginator):
+    """
+    Пагинатор по ключу (created, id).
+
+    Страница выбирается условием по ключу вместо OFFSET, а общее
+    количество записей берётся из кэша, поэтому любая страница стоит
+    столько же, сколько первая.
+    """
+    is_cursor = True
+    # Тип первого значения ключа, курсор с другим типом не принимается
+    key_type = datetime
+
+    def __init__(self, object_list, per_page, keys=('created', 'id'),
+                 count_key=None):
+        super().__init__(object_list, per_page, count_key=count_key)
+        self.keys = keys
+
+    def cursor_values(self, obj):
+        return obj.created, obj.pk
+
+    def _seek(self, keys, direction, values):
+        created, pk = keys
+        lookup = 'lt' if direction == NEXT else 'gt'
+        return (
+            Q(**{f'{created}__{lookup}': values[0]})
+            | Q(**{created: values[0], f'{pk}__{lookup}': values[1]})
+        )
+
+    def _fetch_from(self, queryset, keys, direction, values):
+        if values is not None:
+            queryset = queryset.filter(self._seek(keys, direction, values))
+        if direction == NEXT:
+            ordering = [f'-{key}' for key in keys]
+        else:
+            ordering = list(keys)
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    def _fetch(self, direction, values):
+        return self._fetch_from(
+            self.object_list, self.keys, direction, values
+        )
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded and not isinstance(decoded[1][0], self.key_type):
+            decoded = None
+        direction, values = decoded or (NEXT, None)
+        items = self._fetch(direction, values)
+        if not items and values is not None:
+            direction, values = NEXT, None
+            items = self._fetch(direction, values)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if direction == PREVIOUS:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+        page = Page(items, 1, self)
+        page.cursor = encode_cursor(direction, values) if values else ''
+        page.next_cursor = None
+        page.previous_cursor = None
+        if items and has_next:
+            page.next_cursor = encode_cursor(
+                NEXT, self.cursor_values(items[-1])
+            )
+        if items and has_previous:
+            page.previous_cursor = encode_cursor(
+                PREVIOUS, self.cursor_values(items[0])
+            )
+        return page
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Курсорный пагинатор ленты подписок.
+
+    Сливает по ключу (created, id) записи таблицы Timeline и посты
+    популярных авторов (pulled), которые в ленты не раскладываются
+    и читаются при запросе. Пост, попавший в оба потока, выводится
+    один раз.
+    """
+
+    def __init__(self, object_list, per_page, pulled=None, count_key=None):
+        super().__init__(
+            object_list, per_page,
+            keys=('created', 'post_id'), count_key=count_key
+        )
+        self.pulled = pulled
+
+    def bounded_count(self, limit):
+        count = super().bounded_count(limit)
+        if self.pulled is not None and count < limit:
+            count += self.pulled.order_by()[:limit - count].count()
+        return count
+
+    def _fetch(self, direction, values):
+        posts = [
+            entry.post for entry in super()._fetch(direction, values)
+        ]
+        if self.pulled is None:
+            return posts
+        pulled = self._fetch_from(
+            self.pulled, ('created', 'id'), direction, values
+        )
+        merged = heapq.merge(
+            posts, pulled,
+            key=self.cursor_values, reverse=direction == NEXT
+        )
+        items = []
+        for post in merged:
+            if not items or items[-1].pk != post.pk:
+                items.append(post)
+        return items[:self.per_page + 1]
 
 
-def get_page_obj(queryset, request):
-    paginator = Paginator(queryset, settings.NUM_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+def get_page_obj(queryset, request, paginator_class=CursorPaginator,
+                 per_page=None, **kwargs):
+    paginator = paginator_class(
+        queryset, per_page or settings.NUM_POSTS, **kwargs
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
     return page_obj
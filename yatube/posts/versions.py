@@ -0,0 +1,116 @@
+import time
+from hashlib import md5
+
+from django.core.cache import cache
+
+from .models import Group, Post, User
+
+
+def version_key(scope, pk=None):
+    """Ключ версии: index, group, author, post, groups, users."""
+    if pk is None:
+        return f'version:{scope}'
+    return f'version:{scope}:{pk}'
+
+
+def initial_version():
+    # Начинаем с текущего времени, чтобы версия, вытесненная из кэша,
+    # не совпала с прежней и не подняла старые записи
+    return int(time.time() * 1000)
+
+
+def get_versions(*keys):
+    """
+    Текущие версии по ключам version_key, отсутствующие создаются.
+    Горячие ключи читаются одним get_many. Холодный создаётся через add:
+    если его тем временем поднял другой процесс, берётся поднятая версия,
+    а не затирается более старой.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = initial_version()
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def version_tag(*keys):
+    """Версии одной строкой, для ключа кэша."""
+    return '.'.join(str(version) for version in get_versions(*keys))
+
+
+def bump(*keys):
+    """Поднимает версии: всё закэшированное под старыми устаревает."""
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, initial_version(), None)
+
+
+def feed_version_keys(scope, pk=None):
+    """Ключи версий ленты: её собственная плюс общие для групп и авторов."""
+    return [
+        version_key(scope, pk), version_key('groups'), version_key('users')
+    ]
+
+
+def feed_version(scope, pk=None):
+    return version_tag(*feed_version_keys(scope, pk))
+
+
+def lookup_key(kind, value):
+    """Ключ кэша для поиска по slug или username, безопасный для memcached."""
+    return f'{kind}:{md5(str(value).encode()).hexdigest()}'
+
+
+def cached_value(key, queryset):
+    """
+    Значение из кэша или первое значение queryset (values_list с flat).
+    Нужно, чтобы по slug или username находить pk без запроса в базу.
+    """
+    value = cache.get(key)
+    if value is None:
+        value = queryset.first()
+        if value is not None:
+            cache.set(key, value, None)
+    return value
+
+
+# Ключи версий страниц по аргументам их адресов. None - объекта нет
+def index_versions():
+    return feed_version_keys('index')
+
+
+def groups_versions():
+    return [version_key('groups')]
+
+
+def group_versions(slug):
+    pk = cached_value(
+        lookup_key('group_pk', slug),
+        Group.objects.filter(slug=slug).values_list('pk', flat=True)
+    )
+    return None if pk is None else feed_version_keys('group', pk)
+
+
+def profile_versions(username):
+    pk = cached_value(
+        lookup_key('author_pk', username),
+        User.objects.filter(username=username).values_list('pk', flat=True)
+    )
+    return None if pk is None else feed_version_keys('author', pk)
+
+
+def post_versions(post_id):
+    author_id = cached_value(
+        lookup_key('post_author', post_id),
+        Post.objects.filter(pk=post_id).values_list('author_id', flat=True)
+    )
+    if author_id is None:
+        return None
+    return feed_version_keys('post', post_id) + [
+        version_key('author', author_id)
+    ]
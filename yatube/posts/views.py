@@ -1,45 +1,79 @@
-from django.db.models import Prefetch
+import os
+from concurrent import futures
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import (
+    Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404
 from django.shortcuts import redirect
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.urls import reverse
 
+from core.sendfile import send_file
+
 from .models import Post, Group, User, Follow, Comment
 from .forms import PostForm, CommentForm
-from .utils import get_page_obj
+from .search import SearchPaginator
+from .timeline import pulled_queryset, timeline_queryset
+from .utils import TimelinePaginator, get_page_obj
+from . import exporter, resize, thumbnails
+from .decorators import cache_anonymous, conditional_get
+from .feeds import (
+    AuthorAtomFeed, AuthorFeed, GroupAtomFeed, GroupFeed, IndexAtomFeed,
+    IndexFeed
+)
+from .versions import (
+    feed_version, group_versions, index_versions, post_versions,
+    profile_versions
+)
 
 
+@cache_anonymous(index_versions)
 def index(request):
     page_obj = get_page_obj(
         Post.objects.select_related('author', 'group').all(),
         request
     )
+    thumbnails.prefetch(page_obj)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        'cache_version': feed_version('index'),
     }
     return render(request, 'posts/index.html', context)
 
 
+@conditional_get(group_versions, per_user=True)
+@cache_anonymous(group_versions)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
     page_obj = get_page_obj(
         group.posts.select_related('author', 'group'),
         request
     )
+    thumbnails.prefetch(page_obj)
     context = {
         'group': group,
         'page_obj': page_obj,
+        'cache_version': feed_version('group', group.pk),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@conditional_get(profile_versions, per_user=True)
+@cache_anonymous(profile_versions)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
     page_obj = get_page_obj(
         author.posts.select_related('author', 'group'),
         request
     )
 
+    thumbnails.prefetch(page_obj)
     if request.user.is_authenticated:
         following = Follow.objects.filter(
             user=request.user, author=author
@@ -50,29 +84,116 @@ def profile(request, username):
         'author': author,
         'page_obj': page_obj,
         'following': following,
+        'cache_version': feed_version('author', author.pk),
     }
     return render(request, 'posts/profile.html', context)
 
 
+index_conditional = conditional_get(index_versions)
+group_conditional = conditional_get(group_versions)
+author_conditional = conditional_get(profile_versions)
+
+index_rss = index_conditional(IndexFeed())
+index_atom = index_conditional(IndexAtomFeed())
+group_rss = group_conditional(GroupFeed())
+group_atom = group_conditional(GroupAtomFeed())
+author_rss = author_conditional(AuthorFeed())
+author_atom = author_conditional(AuthorAtomFeed())
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = get_page_obj(
+        Post.objects.select_related('author', 'group'),
+        request,
+        paginator_class=SearchPaginator,
+        query=query
+    )
+    thumbnails.prefetch(page_obj)
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': f'{urlencode({"q": query})}&',
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def get_comments_page(post_id, request):
+    return get_page_obj(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        request,
+        per_page=settings.NUM_COMMENTS
+    )
+
+
+@conditional_get(post_versions, per_user=True)
+@cache_anonymous(post_versions)
 def post_detail(request, post_id):
     post = get_object_or_404(
-        Post.objects.prefetch_related(
-            Prefetch(
-                'comments',
-                queryset=Comment.objects.select_related('author')
-            )
-        ),
+        Post.objects.select_related('author__stats', 'group'),
         pk=post_id
     )
+    thumbnails.prefetch([post])
     form = CommentForm(request.POST or None)
     context = {
         'form': form,
         'post': post,
+        'comments': get_comments_page(post.pk, request),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@cache_anonymous(post_versions)
+def post_comments(request, post_id):
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = get_comments_page(post.pk, request)
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'comments': [
+                {
+                    'id': comment.pk,
+                    'author': comment.author.username,
+                    'text': comment.text,
+                    'created': comment.created,
+                }
+                for comment in comments
+            ],
+            'next': comments.next_cursor,
+        })
+    return render(
+        request,
+        'includes/comments.html',
+        {'post': post, 'comments': comments}
+    )
+
+
+def resized_image(request, spec, signature, name):
+    """
+    Картинка поста произвольного размера по подписанной ссылке из
+    resize.resize_url. Готовые варианты отдаются из дискового кэша.
+    """
+    if not resize.check_signature(spec, name, signature):
+        raise Http404
+    try:
+        path = resize.get_resized(spec, name)
+        internal_url = settings.RESIZE_INTERNAL_URL + os.path.relpath(
+            path, settings.RESIZE_CACHE_DIR
+        ).replace(os.sep, '/')
+        # Под одной ссылкой всегда одно и то же содержимое
+        return send_file(
+            request, path, internal_url=internal_url,
+            cache_control='public, max-age=31536000, immutable'
+        )
+    except futures.TimeoutError:
+        response = HttpResponse(status=503)
+        response['Retry-After'] = 1
+        return response
+    except (resize.InvalidSpec, OSError):
+        raise Http404
+
+
 @login_required
+@transaction.atomic
 def post_create(request):
     form = PostForm(
         request.POST or None,
@@ -93,6 +214,7 @@ def post_create(request):
 
 
 @login_required
+@transaction.atomic
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
 
@@ -118,6 +240,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -132,28 +255,50 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     page_obj = get_page_obj(
-        Post.objects.filter(
-            author__following__user=request.user
-        ), request
+        timeline_queryset(request.user),
+        request,
+        paginator_class=TimelinePaginator,
+        pulled=pulled_queryset(request.user)
     )
+    thumbnails.prefetch(page_obj)
     context = {'page_obj': page_obj}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     user = request.user
-    author = User.objects.get(username=username)
-    is_follower = Follow.objects.filter(user=user, author=author)
-    if user != author and not is_follower.exists():
-        Follow.objects.create(user=user, author=author)
+    author = get_object_or_404(User, username=username)
+    if user != author:
+        # Повторная подписка из параллельного запроса не упадёт
+        # на уникальности, а найдёт уже созданную
+        Follow.objects.get_or_create(user=user, author=author)
     return redirect(reverse('posts:profile', args=[username]))
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     is_follower = Follow.objects.filter(user=request.user, author=author)
     if is_follower.exists():
         is_follower.delete()
     return redirect('posts:profile', username=author)
+
+
+@login_required
+def export(request):
+    """Выгрузка постов, комментариев и подписок пользователя потоком."""
+    file_format = request.GET.get('format', 'jsonl')
+    if file_format not in exporter.FORMATS:
+        raise Http404
+    lines, content_type = exporter.FORMATS[file_format]
+    response = StreamingHttpResponse(
+        exporter.buffered(lines(exporter.records(request.user))),
+        content_type=f'{content_type}; charset=utf-8'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{request.user.username}.{file_format}"'
+    )
+    return response
@@ -144,6 +144,72 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Константа обозначающая количество постов выводимых на странице
 NUM_POSTS = 10
+# Количество комментариев на одной странице поста
+NUM_COMMENTS = 20
+# Сколько постов ленты считать, пока счётчик не попал в кэш
+FEED_COUNT_LIMIT = 1000
+# Время жизни счётчиков лент в кэше, секунд
+FEED_COUNT_TIMEOUT = 60 * 60 * 24
+# Размер пачки при раскладке постов по лентам подписчиков
+TIMELINE_BATCH_SIZE = 500
+# Посты авторов, у которых подписчиков больше порога, не раскладываются
+# по лентам, а читаются при открытии ленты подписок
+TIMELINE_FANOUT_THRESHOLD = 10000
+# Обратно в раскладку автор возвращается, только когда подписчиков стало
+# не больше этого порога, и лишь командой rebuild_timelines. Разрыв
+# между порогами не даёт подпискам и отпискам гонять посты туда-обратно
+TIMELINE_PUSHBACK_THRESHOLD = 8000
+# Время жизни страниц, закэшированных для анонимных пользователей, секунд.
+# Устаревшие страницы отсекаются версиями, срок лишь чистит кэш
+RESPONSE_CACHE_TIMEOUT = 60 * 15
+# Картинка поста в ленте: размер для src и ширины для srcset.
+# Все варианты создаются заранее, как только пост с картинкой сохранён
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (480, 960, 1440)
+# Современные форматы в порядке предпочтения, JPEG создаётся всегда.
+# Формат пропускается, если сборка Pillow не умеет его сохранять
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+POST_IMAGE_QUALITY = 80
+# Сколько цветов в градиенте-заглушке, который виден до загрузки картинки
+POST_PLACEHOLDER_COLORS = 4
+# Загруженные картинки постов: файлы больше POST_UPLOAD_MAX_BYTES и
+# картинки больше POST_UPLOAD_MAX_PIXELS отклоняются, остальные
+# уменьшаются до POST_UPLOAD_MAX_SIZE и пересжимаются без метаданных
+POST_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+POST_UPLOAD_MAX_PIXELS = 50_000_000
+POST_UPLOAD_MAX_SIZE = (2560, 2560)
+POST_UPLOAD_QUALITY = 85
+# Картинки постов хранятся под именем из хэша содержимого, разложенными
+# по стольким уровням вложенных каталогов
+MEDIA_SHARD_DEPTH = 2
+# Картинки постов произвольного размера по подписанным ссылкам:
+# наибольший размер, потоки рендера, сколько ждать рендер, секунд,
+# качество JPEG и дисковый кэш готовых вариантов с бюджетом в байтах
+RESIZE_MAX_SIZE = (2560, 2560)
+RESIZE_WORKERS = 2
+RESIZE_TIMEOUT = 30
+RESIZE_QUALITY = 80
+RESIZE_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'resize')
+RESIZE_CACHE_MAX_BYTES = 1024 * 1024 * 1024
+# Импорт постов: строк в одном INSERT и пачек в одной транзакции
+IMPORT_BATCH_SIZE = 1000
+IMPORT_BATCHES_PER_TRANSACTION = 10
+# Ленты RSS и Atom: сколько постов и сколько слов в заголовке записи
+SYNDICATION_ITEMS = 20
+SYNDICATION_TITLE_WORDS = 8
+# JSON API: постов на странице по умолчанию и наибольший limit=
+API_PAGE_SIZE = 20
+API_MAX_PAGE_SIZE = 100
+# Сколько постов можно запросить по id за раз
+API_BATCH_MAX_IDS = 300
+# Выгрузка: сколько строк читать из базы за раз
+EXPORT_CHUNK_SIZE = 2000
+# Потоков в фоновом пуле миниатюр, 0 - создавать сразу
+THUMBNAIL_WORKERS = 2
+# Поиск по постам: сколько слов запроса учитывать и сколько слов
+# текста показывать вокруг совпадений
+SEARCH_MAX_WORDS = 10
+SEARCH_SNIPPET_WORDS = 24
 # Константа (срез) длина выводимого поста
 LEN_TEXT_IN_STR = 15
 
@@ -151,9 +217,33 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
-
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Каталоги MEDIA_ROOT, открытые всем, остальное видит только персонал
+MEDIA_PUBLIC_DIRS = ('posts/', 'cache/')
+# Сколько браузеры и прокси хранят открытые файлы, секунд
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24
+# Кто отдаёт байты файлов: None - сам Django через FileResponse,
+# 'nginx' - X-Accel-Redirect, 'apache' - X-Sendfile (mod_xsendfile)
+SENDFILE_BACKEND = None
+# internal-локации nginx, которые смотрят в MEDIA_ROOT и RESIZE_CACHE_DIR
+MEDIA_INTERNAL_URL = '/internal/media/'
+RESIZE_INTERNAL_URL = '/internal/resize/'
+
+# Версии кэша, страницы анонимов и ETag должны быть общими для всех
+# процессов сервера: версия, поднятая в одном процессе, иначе не видна
+# другим, и они отдают устаревшее. LocMemCache живёт внутри процесса
+# и годится только для разработки и тестов. На сервере задайте адрес
+# memcached в MEMCACHED_LOCATION, иначе check --deploy выдаст ошибку
+MEMCACHED_LOCATION = os.environ.get('MEMCACHED_LOCATION')
+if MEMCACHED_LOCATION:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+            'LOCATION': MEMCACHED_LOCATION.split(','),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}